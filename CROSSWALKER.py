@@ -7,39 +7,102 @@ WordNet, Merriam-Webster and Encyclopedia.com.
 """
 
 
+import math
+import time
+_IMPORT_START = time.perf_counter()
+
 from modules import EncyclopediaSearch
 from modules import WikiSearch
 from modules import MerriamSearch
 from modules import WordnetSearch
-from scrape_puzzle import CrosswordDisplay
-from collections import defaultdict
-import numpy as np
+from modules import HistorySearch
+from modules import LazyLoader
+from modules import CandidateFetcher
+from modules import HttpCache
+from modules import CandidateStore
+from modules import Settings
+from modules import Lexicon
+from modules import CandidateScore
+from modules import ClueArchive
+from modules import CandidateFilter
+from modules import Metrics
+from modules.ArcConsistency import ArcConsistency
+from modules.MacSearch import MacSearch
+from modules.MaxCspSearch import MaxCspSearch, ValueTable
+from modules import Portfolio
+from modules.PuzzleModel import PuzzleModel, findSlots
+from modules.SolutionSink import SolutionSink
+from modules.LazyLoader import lazyImport
+from scrape_puzzle import CrosswordDisplay, ARCHIVE_DATE
+from collections import defaultdict, Counter
+import argparse
 import re
-from nltk.corpus import stopwords
-import time
-import spacy
 import functools
-import enchant
 
-nlp = spacy.load('en_core_web_lg')
+# Heavy dependencies are only imported the first time they are used,
+# see LazyLoader.startupReport() or run with --startup-profile
+np = lazyImport('numpy')
+spacy = lazyImport('spacy')
+
+# The spacy model is the single most expensive thing to load, call nlp.get() to use it
+nlp = LazyLoader.lazyResource('en_core_web_lg', lambda: spacy.load('en_core_web_lg'))
+
+_IMPORT_TIME = time.perf_counter() - _IMPORT_START
+
+# Version of the candidate filter pipeline (cleanCandidates, CandidateFilter and the filters they mirror).
+# Bump it whenever a filter changes so that candidate sets stored by older versions are ignored.
+FILTER_VERSION = 3
+
+# Number of best solutions kept while searching
+SOLUTION_POOL = 10
+
+# Seconds the branch and bound search may take before the best solution so far is used
+SOLVE_SECONDS = 60
+
+# Filling blank spaces: most blanks in one answer, most dictionary words tried per answer
+# (those leaving the crossing answers the most words), and seconds the fill may take
+FILL_MAX_BLANKS = 4
+FILL_LIMIT = 2000
+FILL_SECONDS = 2
+
+# Seconds a single call to each source may take before its results are given up on
+SOURCE_TIMEOUTS = {
+    'History': 10,
+    'Encyclopedia': 60,
+    'Wikipedia': 45,
+    'WordNet': 30,
+    'Merriam-Webster': 90,
+}
+
+# Past answers come from the local archive: they skip the candidate store and the filters,
+# and the web sources are skipped for clues the archive has answered word for word
+HISTORY = 'History'
+TRUST_HISTORY = True
 
 
 class Clue:
+    __slots__ = ('clue', 'startPos', 'heading', 'length', 'candidates', 'backup', 'id',
+                 'answer', 'constraints', 'letter_positions', 'positions', 'clue_type', 'slot',
+                 'scores')
+
     def __init__(self, clue, startPos, heading, length, id):
         self.clue = clue
         self.startPos = startPos
         self.heading = heading  # (0,1) for across (1,0) for down
         self.length = length
         self.candidates = set()
+        self.scores = dict()    # candidate -> score, see CandidateScore
         self.backup = set()
         self.id = id
         self.answer = ""
         self.constraints = []
         self.letter_positions = []
         self.clue_type = None
+        self.slot = None        # index of the clue in the PuzzleModel
         for i in range(length):
             self.letter_positions.append(
                 (startPos[0] + i * heading[0], startPos[1] + i * heading[1]))
+        self.positions = {pos: i for i, pos in enumerate(self.letter_positions)}
 
     def addConstraints(self, clue):
         """
@@ -47,79 +110,274 @@ class Clue:
 
         """
         for i, pos in enumerate(clue.letter_positions):
-            if pos in self.letter_positions:
-                self.constraints.append(
-                    ((self.id, clue.id), (self.letter_positions.index(pos), i)))
-                return ((self.id, clue.id), (self.letter_positions.index(pos), i))
+            index = self.positions.get(pos)
+            if index is not None:
+                self.constraints.append(((self.id, clue.id), (index, i)))
+                return ((self.id, clue.id), (index, i))
         return None
 
 
 class CROSSWALKER:
-    def __init__(self):
+    def __init__(self, use_store=True):
         self.scraper = CrosswordDisplay()
-        self.solution = np.array([["" for _ in range(5)] for __ in range(5)])
-        self.constraints = []
-        self.sols = []
-
-    def initCandidates(self):
+        self.N = 0
+        self.solution = None
+        self.constraints = []       # ((id, other id), (index, other index)) arcs
+        self.model = None
+        self.arcs = []              # the same arcs between PuzzleModel slots
+        self.sink = SolutionSink(SOLUTION_POOL, score=self.solutionScore)
+
+        # Cleaned candidates of clues seen before, see getSourceCandidates
+        self.store = None
+        if use_store:
+            self.store = CandidateStore.CandidateStore(
+                Settings.dataPath('candidates.sqlite'), FILTER_VERSION)
+
+    @Metrics.timed('candidates')
+    def initCandidates(self, concurrent=True):
         """
             Initialize candidate lists for all clues.
+
+            ...
+
+            Parameters
+            ----------
+            concurrent: bool
+                if True every (clue, source) pair is fetched at once on a thread pool,
+                otherwise clues and sources are handled one at a time
         
         """
+        if not concurrent:
+            # Look every word shared between clues up once before going clue by clue,
+            # skipping clues whose Merriam-Webster candidates are already stored
+            merriam_clues = []
+            clue_sources = dict()
+            for id, clue in self.clues.items():
+                clue.clue_type, clue_text = self.determineClueType(clue.clue)
+                clue_sources[id] = clue_text, sources = self.getSources(clue)
+                if not any(source == 'Merriam-Webster' for source, fn in sources):
+                    continue
+                if self.store and self.store.get(clue.clue, clue.length, clue.clue_type, 'Merriam-Webster') is not None:
+                    continue
+                merriam_clues.append(clue_text)
+            MerriamSearch.prefetchWords(merriam_clues)
+
+            for id, clue in self.clues.items():
+                print(f'Getting candidates for clue {id} : {clue.clue}')
+                clue.scores = self.getCandidates(clue, *clue_sources[id])
+                clue.candidates = set(clue.scores)
+                print(f'Got {len(clue.candidates)} candidates')
+            return
+
+        # Candidates are scored on what each source found, so keep them apart
+        by_source = defaultdict(dict)
+
+        # Stored candidates are read here, only the sources missing from the store are asked
+        jobs = []
         for id, clue in self.clues.items():
-            print(f'Getting candidates for clue {id} : {clue.clue}')
             clue.clue_type, clue_text = self.determineClueType(clue.clue)
-            clue.candidates = self.getCandidates(clue)
-            print(f'Got {len(clue.candidates)} candidates')
+            clue_text, sources = self.getSources(clue)
+            for source, fn in sources:
+                stored = self.storedCandidates(clue, source)
+                if stored is not None:
+                    by_source[id][source] = stored
+                    continue
+                jobs.append(CandidateFetcher.Job(
+                    id, source, functools.partial(self.fetchSourceCandidates, clue, clue_text, source, fn)))
+
+        # Corpus readers are not safe to load from several threads at once. Words shared
+        # between clues are still looked up once, through MerriamSearch's word memo
+        if any(job.source == 'WordNet' for job in jobs):
+            WordnetSearch.preload()
+        Lexicon.load()
+
+        def report(job, candidates):
+            print(f'\t{job.source} returned {len(candidates)} words for {job.key}')
+            by_source[job.key][job.source] = candidates
+            # Stored from this thread, so calls that came in after their timeout never are
+            self.storeCandidates(self.clues[job.key], job.source, candidates)
+
+        print(f'Getting candidates for {len(self.clues)} clues from {len(jobs)} source calls')
+        CandidateFetcher.fetchConcurrent(jobs, SOURCE_TIMEOUTS, on_result=report)
 
-    def getCandidates(self, clue):
+        for id, clue in self.clues.items():
+            clue.scores = CandidateScore.scoreCandidates(by_source[id], clue.clue)
+            clue.candidates = set(clue.scores)
+            print(f'Got {len(clue.candidates)} candidates for clue {id} : {clue.clue}')
+
+    def getSources(self, clue):
         """
-            Get Candidates for given clue.
+            Decide which sources to ask for a clue's candidates, based on its type.
+            The clue history comes first, for clues of every type, and is the only
+            source of clues it has an exact match for, see TRUST_HISTORY.
 
             ...
 
             Parameters
             ----------
                 clue: Clue
-                    Clue object to get candidates for
+                    Clue object to get candidates for, clue_type must already be set
 
             ...
 
             Returns
             -------
-            candidates: set
-                set of all legal candidates
+            clue_text: str
+                clue text to search for and to clean the candidates with
+            sources: list
+                (source name, function returning a set of raw candidates) pairs
         """
 
-        candidates = set()
+        length = clue.length
+        clue_text = clue.clue
+
+        # Clues repeat, so look in past puzzles first, it takes a millisecond
+        exact, similar = HistorySearch.search(clue.clue, length)
+        history = [(HISTORY, lambda: similar)] if similar else []
+        if exact and TRUST_HISTORY:
+            return clue_text, history
 
         # Don't bother searching for clues of these types as they are nearly impossible to find
-        # return an empty set instead so we can ignore it in constraint satisfaction
+        # return no other sources so we can ignore it in constraint satisfaction
         if clue.clue_type in ['QuestionMark', 'SquareBrackets', 'ReferClue', 'HumanSpeech']:
-            return candidates
-
-        length = clue.length
-        clue_text = clue.clue
+            return clue_text, history
 
         # If clue is an abbreviation, we get the best results after formatting it a certain
         # way
         if clue.clue_type == 'Abbreviation':
             clue_text = self.formatAbbr(clue.clue)
 
+        merriam = ('Merriam-Webster', lambda: MerriamSearch.getCandidates(clue_text))
+
         # If the clue is a kindof or single word clue, the answers are most frequently
         # found in the dictionary, thesaurus so no need to get candidates from other
         # sources
         if clue.clue_type in ['SingleWord', 'KindOf']:
-            candidates = candidates.union(
-                MerriamSearch.getCandidates(clue_text))
+            return clue_text, history + [merriam]
 
         # Get candidates from all sources for all other clue types
-        else:
-            candidates = candidates.union(EncyclopediaSearch.getCandidates(clue_text), WikiSearch.getCandidates(
-                clue_text), WordnetSearch.getCandidates(clue_text, length), MerriamSearch.getCandidates(clue_text))
-        candidates = self.cleanCandidates(clue_text, candidates, length)
+        return clue_text, history + [
+            ('Encyclopedia', lambda: EncyclopediaSearch.getCandidates(clue_text)),
+            ('Wikipedia', lambda: WikiSearch.getCandidates(clue_text)),
+            ('WordNet', lambda: WordnetSearch.getCandidates(clue_text, length)),
+            merriam,
+        ]
+
+    def getCandidates(self, clue, clue_text, sources):
+        """
+            Get Candidates for given clue, asking its sources one after the other.
+
+            ...
+
+            Parameters
+            ----------
+                clue: Clue
+                    Clue object to get candidates for
+                clue_text: str
+                    clue text to clean the candidates with, see getSources
+                sources: list
+                    (source name, function) pairs to ask, see getSources
+
+            ...
+
+            Returns
+            -------
+            scores: dict
+                all legal candidates -> score, see CandidateScore
+        """
+
+        if not sources:
+            return dict()
+
+        # A source that fails only loses its own candidates, as on the concurrent path
+        by_source = dict()
+        for source, fn in sources:
+            try:
+                by_source[source] = self.getSourceCandidates(clue, clue_text, source, fn)
+            except Exception as e:
+                print(f'\t{source} failed for {clue.id}: {e!r}')
+        return CandidateScore.scoreCandidates(by_source, clue.clue)
+
+    def getSourceCandidates(self, clue, clue_text, source, fn):
+        """
+            Get the cleaned candidates a single source gives for a clue, with the number
+            of times the source mentioned each of them. They are taken from the candidate
+            store when this clue was seen before, otherwise the source is asked, see
+            fetchSourceCandidates, and the result is stored, see storeCandidates.
+
+            ...
+
+            Parameters
+            ----------
+            clue: Clue
+                Clue object to get candidates for
+            clue_text: str
+                clue text to clean the candidates with
+            source: str
+                name of the source
+            fn: function
+                returns the raw candidates of the source, a Counter of mentions or
+                any iterable of words
+
+            ...
+
+            Returns
+            -------
+            candidates: Counter
+                cleaned candidates of the source -> mentions
+        """
+
+        candidates = self.storedCandidates(clue, source)
+        if candidates is None:
+            candidates = self.fetchSourceCandidates(clue, clue_text, source, fn)
+            self.storeCandidates(clue, source, candidates)
         return candidates
 
+    def storedCandidates(self, clue, source):
+        """
+            Get the stored candidates of a source for a clue, None if there are none.
+            Past answers from the clue history are never stored.
+        """
+
+        if not self.store or source == HISTORY:
+            return None
+        candidates = self.store.get(clue.clue, clue.length, clue.clue_type, source)
+        if candidates is not None:
+            print(f'\tUsing stored {source} candidates for {clue.id}')
+            Metrics.count('candidate_store_hits', source=source)
+        return candidates
+
+    def fetchSourceCandidates(self, clue, clue_text, source, fn):
+        """
+            Ask a source for a clue's candidates and clean them, see getSourceCandidates.
+            Cleaning each source on its own gives the same union as cleaning them
+            together since every filter works on one word at a time. Past answers from
+            the clue history are used as they are.
+        """
+
+        if source == HISTORY:
+            with Metrics.span('source', source=source):
+                return Counter(fn())
+
+        with Metrics.span('source', source=source):
+            raw = fn()
+        with Metrics.span('clean', source=source):
+            candidates = self.countMentions(raw, self.cleanCandidates(clue_text, raw, clue.length))
+        Metrics.count('source_calls', source=source)
+        Metrics.count('candidates_cleaned', len(candidates), source=source)
+        return candidates
+
+    def storeCandidates(self, clue, source, candidates):
+        """
+            Store the cleaned candidates of a source for a clue, so they are not asked
+            for again.
+        """
+
+        # Sources give nothing when their fetches fail, and stored sets never expire, so
+        # an empty set is not stored: the clue is asked about again next time
+        if self.store and candidates and source != HISTORY:
+            self.store.put(clue.clue, clue.length, clue.clue_type, source, candidates)
+
     def determineClueType(self, clue):
         """
         
@@ -239,42 +497,44 @@ class CROSSWALKER:
             clue = clue
             return clue_type, clue
 
-    def initClues(self):
+    def initClues(self, archived=None):
         """
             Initialize all variables we need to solve the puzzle by getting
             the relevant data from scraper.
+
+            ...
+
+            Parameters
+            ----------
+            archived: tuple, optional
+                (cells, across clues, down clues, answers, date) of an archived puzzle,
+                see CrosswordDisplay.fromArchive, to solve instead of today's. It is
+                loaded without drawing anything.
         """
 
-        print('Scraping crossword...')
+        if archived is not None:
+            self.cells, across_clues, down_clues = self.scraper.fromArchive(*archived, draw=False)
+            date = archived[4]
+        else:
+            print('Scraping crossword...')
+
+            # Get scraped data
+            self.cells, across_clues, down_clues = self.scraper.scrapecrossword()
+            date = ARCHIVE_DATE
 
-        # Get scraped data
-        self.cells, across_clues, down_clues = self.scraper.scrapecrossword()
+            print('Scraping finished')
 
-        print('Scraping finished')
+        # Scraping archives the puzzle with its answers, which must not be looked up
+        # while solving it
+        ClueArchive.exclude(date)
 
+        # Find where the answers start, works for grids of any size
         cells = self.cells
-        across_pos = []
-        down_pos = []
-
-        # Get across answer starting positions
-        for i in range(len(cells)):
-            for j in range(len(cells[0])):
-                if not cells[i][j]:
-                    across_pos.append((i, j))
-                    break
-
-        # Get down answer starting positions
-        for i in range(len(cells)):
-            for j in range(len(cells[0])):
-                if not cells[i][j]:
-                    if i == 0:
-                        down_pos.append((i, j))
-                    elif cells[i-1][j]:
-                        down_pos.append((i, j))
-                if len(down_pos) == len(down_clues):
-                    break
-            if len(down_pos) == len(down_clues):
-                break
+        self.N = len(cells)
+        self.solution = np.array([["" for _ in range(self.N)] for __ in range(self.N)])
+        across_slots, down_slots = findSlots(cells)
+        across_pos = [start for start, length in across_slots]
+        down_pos = [start for start, length in down_slots]
 
         # Create Clue objects and add them to a dictionary for easy access
         self.clues = dict()
@@ -290,13 +550,13 @@ class CROSSWALKER:
         for clue in self.clues.values():
             print(f'\tClue {clue.id} : {clue.clue} , {clue.length} letters')
 
-        # Add constraints to each clue for every other clue (bruteforce is ok since we have a small number)
-        for k1 in self.clues:
-            for k2 in self.clues:
-                if k1 != k2:
-                    constraint = self.clues[k1].addConstraints(self.clues[k2])
-                    if constraint:
-                        self.constraints.append(constraint)
+        # Number the clues and find where they cross through a map of the cells,
+        # the solver works on these integer slots
+        self.model = PuzzleModel(self.clues.values())
+        self.arcs = self.model.arcs()
+        self.constraints = self.model.constraints()
+        for (id, other), positions in self.constraints:
+            self.clues[id].constraints.append(((id, other), positions))
 
     def unplural(self, candidates):
         """
@@ -475,11 +735,15 @@ class CROSSWALKER:
             results: set
                 filtered candidates
         """
-        return {word.upper() for word in candidates if word.lower() not in stopwords.words('english') + ['list', 'com', 'www']}
+        stopwords = Lexicon.candidateStopwords()
+        return {word.upper() for word in candidates if word.lower() not in stopwords}
 
     def cleanCandidates(self, clue, candidates, length):
         """
-            Apply all filters to candidates to get a clean set
+            Apply all filters to candidates to get a clean set. The filters run in one
+            pass through CandidateFilter, giving the same set as applying
+            removeNonAlphabetic, unplural, removeStopwords, removeClueWords, fitLength
+            and removeMeaningless in turn.
 
             ...
 
@@ -500,13 +764,38 @@ class CROSSWALKER:
                 filtered candidates
         """
 
-        candidates = self.removeNonAlphabetic(candidates)
-        candidates = self.unplural(candidates)
-        candidates = self.removeStopwords(candidates)
-        candidates = self.removeClueWords(clue, candidates)
-        candidates = self.fitLength(candidates, length)
-        candidates = self.removeMeaningless(candidates)
-        return candidates
+        return CandidateFilter.clean(clue, candidates, length)
+
+    def countMentions(self, raw, candidates):
+        """
+            Count how often the source mentioned each cleaned candidate: the mentions of
+            the raw words that clean to it, as it is or with an s at the end. Candidates
+            the filters made up, e.g. by taking clue words out, count as mentioned once.
+
+            ...
+
+            Parameters
+            ----------
+            raw: Counter
+                raw candidates of the source -> mentions, any other iterable counts
+                every word once
+            candidates: set
+                cleaned candidates
+
+            ...
+
+            Returns
+            -------
+            candidates: Counter
+                cleaned candidates -> mentions
+        """
+
+        raw = raw if isinstance(raw, Counter) else Counter(raw)
+        regex = re.compile('[^a-zA-Z]')
+        mentions = Counter()
+        for word, count in raw.items():
+            mentions[regex.sub('', word).upper()] += count
+        return Counter({word: max(mentions[word] + mentions[word + 'S'], 1) for word in candidates})
 
     def removeMeaningless(self, candidates):
         """
@@ -528,12 +817,7 @@ class CROSSWALKER:
                 filtered candidates
         """
 
-        d = enchant.Dict('en_US')
-        result = set()
-        for word in candidates:
-            if d.check(word):
-                result.add(word)
-        return result
+        return Lexicon.checkMany(candidates)
 
     def AC3(self):
         """
@@ -541,30 +825,18 @@ class CROSSWALKER:
             words that do no satisfy constraints so that we can get a result
         """
 
-        # Get all constraints ie arcs
-        arcs = self.constraints[:]
-
-        # Iterate while arcs is not empty
-        while arcs:
-
-            # Get constraint from arcs
-            cur = arcs.pop(0)
-            clue1, clue2 = cur[0][0], cur[0][1]
-            ind1, ind2 = cur[1][0], cur[1][1]
-
-            # If either of the sides' candidates list is empty, continue
-            if self.clues[clue1].candidates == "" or self.clues[clue2].candidates == "":
-                continue
-
-            # Revise the left side rule's domain, check if any changes were made
-            revised = self.revise(cur)
+        # Work on a plain dict of slot domains, the engine indexes the arcs once
+        # and keeps a deque of arcs to revise
+        domains = self.model.domains(self.clues)
+        engine = ArcConsistency(self.arcs)
+        with Metrics.span('AC3'):
+            engine.propagate(domains)
+        if Metrics.ENABLED:
+            for stat, value in engine.stats.items():
+                Metrics.count(f'ac3_{stat}', value, within='AC3')
 
-            # If any changes are made, add all arcs not in the arcs queue
-            # where current left clue is on the right of arc
-            if revised:
-                for arc in self.constraints:
-                    if arc[0][1] == clue1 and arc not in arcs:
-                        arcs.append(arc)
+        for clue in self.clues.values():
+            clue.candidates = domains[clue.slot]
 
     def revise(self, arc):
         """
@@ -588,89 +860,84 @@ class CROSSWALKER:
                 filtered domain
         """
 
-        # Get relevant information for constraint
-        x, y = self.clues[arc[0][0]], self.clues[arc[0][1]]
-        x_domain, y_domain = x.candidates, y.candidates
-        lind, rind = arc[1][0], arc[1][1]
-
-        # If either of the domains is empty, no need to check further
-        if not x_domain or not y_domain:
-            return False
+        # Words of x's domain survive if y's domain has their letter at the crossing
+        x = self.clues[arc[0][0]]
+        domains = {arc[0][0]: x.candidates, arc[0][1]: self.clues[arc[0][1]].candidates}
+        revised = ArcConsistency([arc]).revise(domains, arc)
+        x.candidates = domains[arc[0][0]]
+        return revised
 
-        revised = False
-        x_domain_revised = set()
+    def solve(self, method='bnb', draw=True):
+        """
+            Solve the constraint satisfaction problem, placing as many answers as
+            possible, and draw the result.
 
-        # Check for every word in x's domain
-        for lword in x_domain:
-            added = False
+            ...
 
-            # Check constraint against every word in y's domain
-            for rword in y_domain:
-                if lword[lind] == rword[rind]:
-                    x_domain_revised.add(lword)
-                    added = True
-            # If no word in y's domain was found st the word in x's domain
-            # satisfied the constraint, we removed it from the domain therefore
-            # the domain is revised
-            if not added:
-                revised = True
+            Parameters
+            ----------
+            method: str
+                see search. The default is 'bnb'.
+            draw: bool
+                if False the grid is only returned, not drawn or saved. The default
+                is True.
 
-        # Update x's domain
-        x.candidates = x_domain_revised
-        return revised
+            ...
 
-    def solve(self):
+            Returns
+            -------
+            grid: list
+                grid that is representative of the crossword puzzle solution
         """
-            Solve the constraint satisfaction problem by first applying the AC3
-            algorithm to the domains of the clues and then applying backtracking.
 
-        """
+        grid = self.search(method)
 
-        # Back-up all candidates
-        for clue in self.clues.values():
-            clue.backup = clue.candidates
+        # Fill in the blanks, if any, in the grid
+        grid = self.fillBlankSpaces(grid)
 
-        # Leave one clue out from clues that have candidates
-        leave_one = [None] + [self.clues[clue]
-                              for clue in self.clues if self.clues[clue].candidates]
+        # Create the image for presentation
+        if draw:
+            self.scraper.drawpredictiongrid(grid)
+            self.scraper.saveimage()
+        return grid
 
-        print('Starting solving process...')
-        for bye in leave_one:
+    def search(self, method='bnb'):
+        """
+            Search for the solution placing the most answers and put it into a grid,
+            blank spaces are not filled yet.
 
-            # Restore candidates from backups each time
-            for clue in self.clues.values():
-                clue.candidates = clue.backup
+            ...
 
-            # Leave out one clue's candidates
-            if bye:
-                print(f'Not including candidates for rule {bye.id}')
-                bye.candidates = set()
-            else:
-                print('Including all candidates for all rules')
+            Parameters
+            ----------
+            method: str
+                'bnb' searches once with branch and bound, letting any clue be left
+                blank. 'leave-one-out' applies AC3 and backtracking once with all
+                candidates and once more for every clue with that clue's candidates
+                left out. 'portfolio' runs several strategies on a process pool.
+                The default is 'bnb'.
 
-            assigned = set()
-            assignment = dict()
+            ...
 
-            clues = sorted(
-                [self.clues[clue] for clue in self.clues if self.clues[clue].candidates], key=lambda e: len(e.candidates))
+            Returns
+            -------
+            grid: list
+                grid that is representative of the best solution found
+        """
 
-            # Apply AC3 followed by backtracking
-            self.AC3()
-            self.backtrack(assigned, assignment, clues)
-            print('\n')
+        print('Starting solving process...')
+        if method == 'bnb':
+            self.maxCsp()
+        elif method == 'portfolio':
+            self.portfolio()
+        else:
+            self.leaveOneOut()
 
-        # Sort sols to get the solution where most answers were placed
-        self.sols.sort(key=lambda sol: len(sol), reverse=True)
+        # Take the solution where most answers were placed
+        print(f'Kept {len(self.sink)} of {self.sink.offered} solutions found')
 
         # Put the solution into a grid that represent the crossword
-        grid = self.putIntoGrid(self.sols[0])
-
-        # Fill in the blanks, if any, in the grid
-        grid = self.fillBlankSpaces(grid)
-
-        # Create the image for presentation
-        self.scraper.drawpredictiongrid(grid)
-        self.scraper.saveimage()
+        return self.putIntoGrid(self.sink.best() or [])
 
     def putIntoGrid(self, sol):
         """
@@ -693,7 +960,7 @@ class CROSSWALKER:
         """
 
         # Create empty grid
-        grid = [["" for _ in range(5)] for __ in range(5)]
+        grid = [["" for _ in range(self.N)] for __ in range(self.N)]
 
         for item in sol:
             clue, ans = item
@@ -707,182 +974,286 @@ class CROSSWALKER:
                 x, y = x+h_x, y+h_y
         return grid
 
-    def backtrack(self, assigned, assignment, clues):
+    def values(self):
+        """
+            Value of placing a candidate in the solver's slots: its score, see
+            CandidateScore.
         """
-            Use backtracking to solve a CSP
 
-            ...
+        return ValueTable(self.model.scores(self.clues))
 
-            Parameters
-            ----------
-            assigned: set
-                clues that have an answer assigned
-            assignment: dict
-                answers for corresponding clues
-            clues: list
-                clues to be used in the CSP
+    def solutionScore(self, items):
+        """
+            Score of a solution for the solution sink: the number of answers placed,
+            then the total score of the answers, the way the searches compare solutions.
         """
 
-        if len(assigned) == len(clues):
-            # print('Assigned everything we can, adding possible solution')
-            self.sols.append(list(assignment.items()))
-            return
+        return (len(items), sum(self.clues[id].scores.get(answer, 0.0) for id, answer in items))
 
-        cur = self.selectUnassigned(assigned, clues)
+    @Metrics.timed('search', method='bnb')
+    def maxCsp(self):
+        """
+            Search once for the largest set of agreeing answers, every clue either
+            getting one of its candidates or staying blank. Every improvement on the
+            best solution so far is offered to the solution sink.
+        """
 
-        if not cur:
-            # print('Backtracking stuck, adding possible solution')
-            self.sols.append(list(assignment.items()))
-            return
+        search = MaxCspSearch(self.model.domains(self.clues), self.arcs, value=self.values(),
+                              deadline=time.monotonic() + SOLVE_SECONDS)
+        for items in self.sink.stream(self.model.toIds(items) for items in search.improvements()):
+            print(f'Best solution so far places {len(items)} answers')
+        Metrics.count('search_nodes', search.nodes, method='bnb')
+        print(f'Searched {search.nodes} nodes' + (', best solution is optimal' if search.exhausted
+                                                 else f', stopped after {SOLVE_SECONDS} seconds'))
 
-        assigned.add(cur.id)
+    @Metrics.timed('search', method='portfolio')
+    def portfolio(self):
+        """
+            Run several search strategies at once on separate processes and offer the
+            solution of the one that wins to the solution sink.
+        """
 
-        for candidate in cur.candidates:
+        def report(result):
+            print(f'Strategy {result["strategy"]} placed {len(result["items"])} answers '
+                  f'in {result["seconds"]:.2f} seconds')
 
-            tmp = ''
-            if cur.id in assignment:
-                tmp = assignment[cur.id]
+        result = Portfolio.solve(self.model.domains(self.clues), self.arcs, on_result=report,
+                                 value=self.values())
+        if result:
+            Metrics.count('search_nodes', result['nodes'], method='portfolio')
+            print(f'Using the solution of strategy {result["strategy"]}')
+            self.sink.offer(self.model.toIds(result['items']))
 
-            assignment[cur.id] = candidate
+    @Metrics.timed('search', method='leave-one-out')
+    def leaveOneOut(self):
+        """
+            Apply AC3 followed by backtracking once with all candidates, then once for
+            every clue that has candidates with that clue's candidates left out.
+        """
 
-            # If consistent, continue with this answer
-            if self.isConsistent(assigned, assignment):
-                print(f'Assigning {cur.id} : {tmp} -> {candidate}')
-                self.backtrack(assigned, assignment, clues)
+        # Back-up all candidates
+        for clue in self.clues.values():
+            clue.backup = clue.candidates
 
-        # Continue with blank answer for current clue
-        self.backtrack(assigned, assignment, clues)
+        # Leave one clue out from clues that have candidates
+        leave_one = [None] + [self.clues[clue]
+                              for clue in self.clues if self.clues[clue].candidates]
 
-    def fillBlankSpaces(self, grid):
-        """
-            Try to fill the blank spaces in the grid. Currently only single blank spaces
-            can be filled (not consecutive spaces)
-            ...
+        for bye in leave_one:
 
-            Parameters
-            ----------
-            grid: list
-                grid that represent the crossword puzzle solution
+            # Restore candidates from backups each time
+            for clue in self.clues.values():
+                clue.candidates = clue.backup
 
-            ...
+            # Leave out one clue's candidates
+            if bye:
+                print(f'Not including candidates for rule {bye.id}')
+                bye.candidates = set()
+            else:
+                print('Including all candidates for all rules')
 
-            Returns
-            -------
-            grid: list
-                grid with blank spaces filled or not filled
+            assigned = set()
+            assignment = dict()
 
-        """
+            clues = sorted(
+                [self.clues[clue] for clue in self.clues if self.clues[clue].candidates], key=lambda e: len(e.candidates))
 
-        blanks = []
-        d = enchant.Dict('en_US')
-
-        # Create pairs of answers for blank spaces
-        for r in range(5):
-            for c in range(5):
-                if grid[r][c] == "" and not self.cells[r][c]:
-                    grid[r][c] = '*'
-                    pair = []
-                    tmp = ""
-                    for y in range(0, 5):
-                        if not self.cells[r][y]:
-                            tmp += grid[r][y]
-                    pair.append(tmp)
-                    tmp = ""
-                    for x in range(0, 5):
-                        if not self.cells[x][c]:
-                            tmp += grid[x][c]
-                    pair.append(tmp)
-                    pair.append((r, c))
-                    blanks.append(pair)
-
-        # For each pair try to find a letter to fill the blank that
-        # makes both answers meaningful words
-        for pair in blanks:
-            word1, word2, pos = pair
-            for letter in 'ABCDEFGHIJKLMNOPQRSTUVWXYZ':
-                if d.check(word1.replace('*', letter)) and d.check(word2.replace('*', letter)):
-                    print(f'Found letter for blank at {pos}')
-                    grid[pos[0]][pos[1]] = letter
-                    break
-
-        # Remove any unfilled blanks that still have the * in them
-        for r in range(5):
-            for c in range(5):
-                if grid[r][c] == '*':
-                    grid[r][c] = ''
-        return grid
+            # Apply AC3 followed by backtracking
+            self.AC3()
+            self.backtrack(assigned, assignment, clues)
+            print('\n')
+
+        # Leave every clue with all of its candidates
+        for clue in self.clues.values():
+            clue.candidates = clue.backup
 
-    def selectUnassigned(self, assigned, clues):
+    @Metrics.timed('backtrack')
+    def backtrack(self, assigned, assignment, clues):
         """
-            Try to fill the blank spaces in the grid. Currently only single blank spaces
-            can be filled (not consecutive spaces)
+            Use backtracking that maintains arc consistency to solve a CSP. Every
+            complete solution and every dead end is offered to the solution sink,
+            which keeps only the best ones.
+
+            This differs from the original plain backtracking in three ways. A clue is
+            never left blank on purpose, that is what the leave-one-out loop is for.
+            A clue whose candidates are all ruled out by the answers placed so far ends
+            its branch as a dead end instead of being skipped. The search stops after
+            SOLUTION_POOL complete solutions, the most the sink keeps, instead of
+            visiting every leaf.
+
             ...
 
             Parameters
             ----------
             assigned: set
-                clues that have already been assigned an answer
-
+                clues that have an answer assigned
+            assignment: dict
+                answers for corresponding clues
             clues: list
-                clues that may or may not have been assigned an answer
-
-            ...
-
-            Returns
-            -------
-            clue: Clue
-                clue that is to be assigned next
-
+                clues to be used in the CSP
         """
 
-        unassigned = sorted(list({clue.id for clue in clues}.difference(
-            assigned)), key=lambda e: self.clues[e].length)
-        for free in unassigned:
-            if self.clues[free].candidates:
-                return self.clues[free]
-        return None
-
-    def isConsistent(self, assigned, assignment):
+        slots = self.model.slots
+        domains = {clue.slot: clue.candidates for clue in clues if clue.id not in assigned}
+        domains.update({slots[id]: {answer} for id, answer in assignment.items()})
+        search = MacSearch(domains, self.arcs, max_solutions=SOLUTION_POOL, value=self.values())
+        leaves = search.leaves({slots[id]: answer for id, answer in assignment.items()})
+        for items in self.sink.stream(self.model.toIds(items) for items, complete in leaves):
+            print(f'Best solution so far places {len(items)} answers')
+        Metrics.count('search_nodes', search.nodes, method='mac')
+        if Metrics.ENABLED:
+            for stat, value in search.engine.stats.items():
+                Metrics.count(f'ac3_{stat}', value, within='backtrack')
+        print(f'Searched {search.nodes} nodes, found {len(search.solutions)} complete solutions')
+
+    @Metrics.timed('fill')
+    def fillBlankSpaces(self, grid):
         """
-            Check if a given state is consistent ie it satisfies all
-            relevant constraints
+            Fill the blank spaces in the grid, single ones as well as runs of them.
+            Every clue with blanks gets the dictionary words matching the letters it
+            already has, clues crossing at a blank must agree on its letter, and the
+            words are chosen together as a small CSP. A blank is only filled when
+            every clue through it got a word. Of a clue with more than FILL_LIMIT
+            words, the ones leaving the crossing clues the most words are tried.
+
             ...
 
             Parameters
             ----------
-            assigned: set
-                clues that have already been assigned an answer
-
-            assignment: dict
-                answers for corresponding clues
+            grid: list
+                grid that represent the crossword puzzle solution
 
             ...
 
             Returns
             -------
-            isConsisten: bool
-                whether the given state is consistent
+            grid: list
+                grid with blank spaces filled or not filled
 
         """
 
-        for id, ans in assignment.items():
-            clue = self.clues[id]
-            for constraint in clue.constraints:
-                rclue = constraint[0][1]
-                lind, rind = constraint[1][0], constraint[1][1]
-                if rclue in assignment.keys() and ans[lind] != assignment[rclue][rind]:
-                    return False
-        return True
+        # Clues going through each cell
+        through = defaultdict(list)
+        for clue in self.clues.values():
+            for pos in clue.letter_positions:
+                through[pos].append(clue)
+
+        blanks = {(r, c) for r in range(self.N) for c in range(self.N)
+                  if grid[r][c] == "" and not self.cells[r][c]}
+        if not blanks:
+            return grid
 
+        # Words that fit the letters already in place, e.g. C**T for a clue with two blanks
+        patterns = dict()
+        for clue in self.clues.values():
+            if any(pos in blanks for pos in clue.letter_positions):
+                patterns[clue.slot] = ''.join(grid[x][y] or '*' for x, y in clue.letter_positions)
+
+        # Letters each blank can take, and for each how many words the clues through it
+        # have left with that letter in place. A letter leaving any of them without a
+        # word can't go there
+        fits = dict()       # blank -> letter -> slot -> words left
+        for pos in blanks:
+            letters = set.intersection(*(Lexicon.lettersAt(patterns[clue.slot], clue.positions[pos])
+                                         for clue in through[pos]))
+            fits[pos] = {letter: dict() for letter in letters}
+            for clue in through[pos]:
+                pattern, i = patterns[clue.slot], clue.positions[pos]
+                for letter in letters:
+                    fits[pos][letter][clue.slot] = Lexicon.countMatches(pattern[:i] + letter + pattern[i + 1:])
+
+        domains = dict()
+        for clue in self.clues.values():
+            pattern = patterns.get(clue.slot)
+            if pattern is None:
+                continue
+            if pattern.count('*') > FILL_MAX_BLANKS:
+                domains[clue.slot] = set()
+                continue
+            cells = [(i, pos) for i, pos in enumerate(clue.letter_positions) if pos in blanks]
+            words = [word for word in Lexicon.matches(pattern) if all(word[i] in fits[pos] for i, pos in cells)]
+            if len(words) > FILL_LIMIT:
+                words.sort(key=lambda word: (-math.prod(fits[pos][word[i]][other.slot] for i, pos in cells
+                                                        for other in through[pos] if other is not clue), word))
+                del words[FILL_LIMIT:]
+            domains[clue.slot] = set(words)
+
+        # A blank in a clue that can't be filled stays blank, so neither can the
+        # other clues through it
+        clues = list(self.clues.values())
+        locked = set()
+        changed = True
+        while changed:
+            changed = False
+            for clue in clues:
+                if clue.slot not in domains:
+                    continue
+                cells = [pos for pos in clue.letter_positions if pos in blanks]
+                if domains[clue.slot] and any(pos in locked for pos in cells):
+                    domains[clue.slot] = set()
+                if not domains[clue.slot] and not locked.issuperset(cells):
+                    locked.update(cells)
+                    changed = True
+
+        domains = {slot: words for slot, words in domains.items() if words}
+        search = MaxCspSearch(domains, [arc for arc in self.arcs if arc[0][0] in domains and arc[0][1] in domains],
+                              deadline=time.monotonic() + FILL_SECONDS)
+        placed = dict(search.run() or [])
+
+        filled = 0
+        for pos in blanks:
+            if pos in locked or not all(clue.slot in placed for clue in through[pos]):
+                continue
+            clue = through[pos][0]
+            grid[pos[0]][pos[1]] = placed[clue.slot][clue.positions[pos]]
+            filled += 1
+        print(f'Filled {filled} of {len(blanks)} blank spaces')
+        return grid
 
-def main():
-    solver = CROSSWALKER()
+
+def main(concurrent=True, use_store=True, method='bnb'):
+    solver = CROSSWALKER(use_store=use_store)
     solver.initClues()
-    solver.initCandidates()
-    solver.solve()
+    solver.initCandidates(concurrent=concurrent)
+    solver.solve(method=method)
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Solve the NYT Mini Crossword.')
+    parser.add_argument('--startup-profile', action='store_true',
+                        help='print how long each dependency took to import or load')
+    parser.add_argument('--filter-profile', action='store_true',
+                        help='print how many candidates each cleaning stage let through')
+    parser.add_argument('--serial', action='store_true',
+                        help='fetch candidates one clue and source at a time')
+    parser.add_argument('--offline', action='store_true',
+                        help='serve every page from the HTTP cache and fetch nothing')
+    parser.add_argument('--no-candidate-store', action='store_true',
+                        help='always ask the sources and filter again, even for clues seen before')
+    parser.add_argument('--solver', choices=['bnb', 'leave-one-out', 'portfolio'], default='bnb',
+                        help='search once with branch and bound (default), restart once per clue left out, '
+                             'or run several strategies in parallel')
+    parser.add_argument('--metrics-json', metavar='FILE',
+                        help='write the time spent in every stage and what it counted to FILE as JSON')
+    parser.add_argument('--metrics-prom', metavar='FILE',
+                        help='write the same metrics to FILE for the Prometheus textfile collector')
+    args = parser.parse_args()
+    if args.offline:
+        HttpCache.setOffline(True)
+    if args.metrics_json or args.metrics_prom:
+        Metrics.enable()
+
     start_time = time.time()
-    main()
+    with Metrics.span('run'):
+        main(concurrent=not args.serial, use_store=not args.no_candidate_store,
+             method=args.solver)
     print("--- %s seconds ---" % (time.time() - start_time))
+    if args.metrics_json:
+        Metrics.writeJson(args.metrics_json)
+    if args.metrics_prom:
+        Metrics.writePrometheus(args.metrics_prom)
+    if args.startup_profile:
+        print(f'CROSSWALKER module import: {_IMPORT_TIME * 1000:.1f} ms')
+        print(LazyLoader.startupReport())
+    if args.filter_profile:
+        print(CandidateFilter.report())
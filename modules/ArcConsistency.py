@@ -0,0 +1,137 @@
+"""
+Arc consistency engine for the crossword CSP. Arcs use the same form as
+CROSSWALKER.constraints, ((x, y), (i, j)) meaning letter i of x's answer must equal
+letter j of y's answer.
+
+Compared to a plain AC-3 over a list:
+    - the queue is a deque with an in-queue set, so popping and membership are O(1)
+    - the arcs to re-check after x changes come from a precomputed index of arcs into x
+    - revising x against y looks letters up in the set of letters y's domain has at
+      position j (cached until y's domain changes), so a revision is O(|X| + |Y|)
+      instead of O(|X| * |Y|)
+"""
+
+from collections import defaultdict, deque
+
+
+class ArcConsistency:
+    """
+    Arc consistency over a fixed set of arcs.
+
+    Domains are dicts of variable -> set of words. Domains are never changed in place,
+    a revision replaces the set, so a trail can restore a domain by putting the old set back.
+
+    ...
+
+    Parameters
+    ----------
+    arcs : list
+        ((x, y), (i, j)) tuples
+
+    """
+
+    def __init__(self, arcs):
+        self.arcs = list(arcs)
+        self.incoming = defaultdict(list)       # x -> arcs (z, x) to re-check when x's domain changes
+        for arc in self.arcs:
+            self.incoming[arc[0][1]].append(arc)
+        self._letters = {}                      # (y, j) -> (domain the letters were taken from, letters)
+        self.stats = {'arcs': 0, 'revisions': 0, 'removed': 0}
+
+    def supportedLetters(self, domains, y, j):
+        """
+        Returns the set of letters found at position j of the words in y's domain.
+
+        """
+        domain = domains[y]
+        cached = self._letters.get((y, j))
+        if cached is not None and cached[0] is domain:
+            return cached[1]
+        letters = {word[j] for word in domain}
+        self._letters[(y, j)] = (domain, letters)
+        return letters
+
+    def revise(self, domains, arc, trail=None):
+        """
+        Removes the words of x's domain that no word of y's domain agrees with.
+        An empty domain on either side means the clue is ignored, so nothing is revised.
+
+        ...
+
+        Parameters
+        ----------
+        domains : dict
+            variable -> set of words
+        arc : tuple
+            ((x, y), (i, j))
+        trail : list, optional
+            (x, previous domain) is appended here when x's domain is replaced
+
+        Returns
+        -------
+        revised : bool
+            whether x's domain changed
+
+        """
+        (x, y), (i, j) = arc
+        x_domain, y_domain = domains[x], domains[y]
+        if not x_domain or not y_domain:
+            return False
+
+        letters = self.supportedLetters(domains, y, j)
+        revised_domain = {word for word in x_domain if word[i] in letters}
+        if len(revised_domain) == len(x_domain):
+            return False
+
+        if trail is not None:
+            trail.append((x, x_domain))
+        domains[x] = revised_domain
+        self.stats['revisions'] += 1
+        self.stats['removed'] += len(x_domain) - len(revised_domain)
+        return True
+
+    def propagate(self, domains, queue=None, trail=None, strict=False):
+        """
+        Runs AC-3 until no domain changes.
+
+        ...
+
+        Parameters
+        ----------
+        domains : dict
+            variable -> set of words, updated in place
+        queue : iterable, optional
+            arcs to start from. The default is None, which starts from every arc.
+        trail : list, optional
+            collects (variable, previous domain) for every change, see revise
+        strict : bool, optional
+            if True a domain becoming empty is a failure and stops propagation.
+            Otherwise an emptied clue is just ignored from then on. The default is False.
+
+        Returns
+        -------
+        consistent : bool
+            False if strict and some domain was wiped out
+
+        """
+        queue = deque(self.arcs if queue is None else queue)
+        in_queue = set(queue)
+
+        while queue:
+            arc = queue.popleft()
+            in_queue.discard(arc)
+            self.stats['arcs'] += 1
+
+            if not self.revise(domains, arc, trail):
+                continue
+            (x, y), (i, j) = arc
+            if strict and not domains[x]:
+                return False
+
+            # x lost words, so every arc into x may have lost supports. The arc from y
+            # can be skipped, the removed words had no partner in y to begin with.
+            for other in self.incoming[x]:
+                if other[0][0] != y and other not in in_queue:
+                    queue.append(other)
+                    in_queue.add(other)
+        return True
@@ -0,0 +1,231 @@
+"""
+Solves many archived puzzles at once on a process pool, writing one JSON line per puzzle
+as soon as it is done: its solution, the seconds of every stage and its accuracy, see
+Benchmark.runPuzzle, or the error it failed with. Pages are played back from recorded
+fixtures like in Benchmark, so a batch needs no network.
+
+A puzzle that raises only fails its own line. A worker process that dies takes the pool
+with it, so the pool is started again and the puzzles it was solving are retried one at a
+time: the one that kills its worker alone fails, the others are solved. Lines already in
+the output file are not solved again, so an interrupted batch picks up where it stopped
+when run again with the same output:
+    python -m modules.BatchSolve --corpus archive.sqlite --output results.jsonl
+    python -m modules.BatchSolve --corpus archive.sqlite --output results.jsonl 2021-04-01 2021-04-02
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import traceback
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from modules import Benchmark
+from modules import ClueArchive
+from modules import HttpCache
+from modules import PuzzleArchive
+from modules import Settings
+
+WORKERS = int(os.environ.get('CROSSWALKER_BATCH_WORKERS', 0)) or None     # None: one per core
+
+
+def _initWorker(fixtures, record, archive):
+    HttpCache.useDirectory(fixtures)
+    HttpCache.setOffline(not record)
+    ClueArchive.usePath(archive)
+
+
+def solvePuzzle(puzzle, method='bnb', concurrent=True, use_store=False):
+    """
+    Solves one puzzle in a worker, see Benchmark.runPuzzle.
+
+    ...
+
+    Returns
+    -------
+    line : dict
+        the result of Benchmark.runPuzzle with status 'ok', or date, status 'error', the
+        error and its traceback
+
+    """
+    try:
+        return {'date': puzzle['date'], 'status': 'ok', **Benchmark.runPuzzle(puzzle, method, concurrent, use_store)}
+    except Exception as e:
+        return {'date': puzzle['date'], 'status': 'error', 'error': repr(e), 'traceback': traceback.format_exc()}
+
+
+def readDone(path, retry_failed=False):
+    """
+    Returns the dates an output file already has a line for, leaving out failed ones
+    if they are to be retried. A line cut short by an interrupted batch is ignored.
+
+    """
+    status = dict()
+    if path and os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    result = json.loads(line)
+                except ValueError:
+                    continue
+                status[result['date']] = result['status']
+    return {date for date, state in status.items() if state == 'ok' or not retry_failed}
+
+
+def endLine(path):
+    """
+    Ends the last line of a file if it is unfinished, e.g. cut short by an interrupted
+    batch, so that lines appended to it start on a line of their own.
+
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, 'rb+') as f:
+        if f.seek(0, os.SEEK_END):
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b'\n':
+                f.write(b'\n')
+
+
+def run(puzzles, out, fixtures=Benchmark.FIXTURES_DIR, record=False, method='bnb', concurrent=True,
+        use_store=False, archive=None, workers=WORKERS):
+    """
+    Solves puzzles on a process pool and writes a JSON line for each as it finishes.
+
+    ...
+
+    Parameters
+    ----------
+    puzzles : list
+        puzzles to solve, see Benchmark.loadCorpus
+    out : file
+        text file the lines are written to, flushed after every line
+    fixtures : str, optional
+        HttpCache directory the source pages are played back from. The default is
+        Benchmark.FIXTURES_DIR.
+    record : bool, optional
+        fetch and store pages missing from the fixtures instead of failing on them.
+        The default is False.
+    method : str, optional
+        search method, see CROSSWALKER.search. The default is 'bnb'.
+    concurrent : bool, optional
+        fetch candidates on a thread pool within each worker. The default is True.
+    use_store : bool, optional
+        use the candidate store. The default is False.
+    archive : str, optional
+        puzzle archive used to score candidates and look clues up. The default is
+        None, no archive, since the puzzles' answers are likely in it.
+    workers : int, optional
+        number of processes. The default is WORKERS, one per core.
+
+    Returns
+    -------
+    results : list
+        the lines written, in the order they were
+
+    """
+    workers = min(workers or os.cpu_count() or 1, len(puzzles)) or 1
+    pending = deque(puzzles)
+    suspects = deque()      # in flight when a worker died, retried alone
+    results = []
+
+    def write(result):
+        results.append(result)
+        out.write(json.dumps(result) + '\n')
+        out.flush()
+
+    def startPool():
+        return ProcessPoolExecutor(workers, initializer=_initWorker, initargs=(fixtures, record, archive))
+
+    executor = startPool()
+    running = dict()        # future -> puzzle
+    try:
+        while pending or suspects or running:
+            if suspects:
+                if not running:
+                    puzzle = suspects.popleft()
+                    running[executor.submit(solvePuzzle, puzzle, method, concurrent, use_store)] = puzzle
+            else:
+                while pending and len(running) < workers:
+                    puzzle = pending.popleft()
+                    running[executor.submit(solvePuzzle, puzzle, method, concurrent, use_store)] = puzzle
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            broken = False
+            for future in done:
+                puzzle = running.pop(future)
+                try:
+                    write(future.result())
+                except BrokenProcessPool:
+                    broken = True
+                    running[future] = puzzle
+            if not broken:
+                continue
+
+            # The pool is gone with every puzzle in flight. A puzzle solved alone killed it,
+            # otherwise any of them may have, so retry them alone
+            if len(running) == 1:
+                puzzle, = running.values()
+                write({'date': puzzle['date'], 'status': 'error', 'error': 'worker process died',
+                       'traceback': None})
+            else:
+                suspects.extend(running.values())
+            running.clear()
+            executor.shutdown(wait=True)
+            executor = startPool()
+    finally:
+        # Only up to one puzzle per worker is ever submitted, so there is little to cancel
+        for future in running:
+            future.cancel()
+        executor.shutdown(wait=False)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Solve archived puzzles in parallel, one JSON line each.')
+    parser.add_argument('dates', nargs='*', help='dates of the puzzles to solve, all of the corpus by default')
+    parser.add_argument('--corpus', default=os.path.join(Settings.DATA_DIR, PuzzleArchive.FILE_NAME),
+                        help='puzzle archive, or directory of archived puzzles with one JSON file each')
+    parser.add_argument('--output', help='JSON lines file to append to and resume from, standard output by default')
+    parser.add_argument('--retry-failed', action='store_true', help='solve puzzles that failed before again')
+    parser.add_argument('--workers', type=int, default=WORKERS, help='number of processes, one per core by default')
+    parser.add_argument('--fixtures', default=Benchmark.FIXTURES_DIR, help='HttpCache directory of recorded pages')
+    parser.add_argument('--record', action='store_true', help='fetch and record pages missing from the fixtures')
+    parser.add_argument('--solver', choices=['bnb', 'leave-one-out'], default='bnb')
+    parser.add_argument('--serial', action='store_true', help='fetch candidates one clue and source at a time')
+    parser.add_argument('--candidate-store', action='store_true', help='use the candidate store')
+    parser.add_argument('--archive', help='puzzle archive to score candidates with')
+    args = parser.parse_args()
+
+    puzzles = Benchmark.loadCorpus(args.corpus)
+    if args.dates:
+        wanted = set(args.dates)
+        puzzles = [puzzle for puzzle in puzzles if puzzle['date'] in wanted]
+        missing = wanted - {puzzle['date'] for puzzle in puzzles}
+        if missing:
+            print(f'Not in the corpus: {", ".join(sorted(missing))}', file=sys.stderr)
+    done = readDone(args.output, args.retry_failed)
+    puzzles = [puzzle for puzzle in puzzles if puzzle['date'] not in done]
+    print(f'Solving {len(puzzles)} puzzles, {len(done)} already done', file=sys.stderr)
+
+    start = time.perf_counter()
+    if args.output:
+        endLine(args.output)
+        with open(args.output, 'a', encoding='utf-8') as out:
+            results = run(puzzles, out, args.fixtures, args.record, args.solver, not args.serial,
+                          args.candidate_store, args.archive, args.workers)
+    else:
+        results = run(puzzles, sys.stdout, args.fixtures, args.record, args.solver, not args.serial,
+                      args.candidate_store, args.archive, args.workers)
+
+    solved = [result for result in results if result['status'] == 'ok']
+    print(f'Solved {len(solved)}, failed {len(results) - len(solved)} '
+          f'in {time.perf_counter() - start:.1f} seconds', file=sys.stderr)
+    if solved:
+        print(json.dumps(Benchmark.summarize(solved)), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
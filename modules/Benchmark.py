@@ -0,0 +1,261 @@
+"""
+Offline end-to-end benchmark. Archived puzzles are solved by the full pipeline, with every
+page the sources ask for played back from a recorded HttpCache directory (the fixtures),
+so runs are repeatable and need no network. Reports the wall time of every stage and the
+share of letters and answers solved right, as JSON to compare across commits.
+
+A corpus is a puzzle archive database (see PuzzleArchive) or a directory of JSON files,
+one puzzle each, holding the arguments of CrosswordDisplay.fromArchive:
+    {"date": "2021-04-01",
+     "cells": [false, true, ...],              N*N flags in reading order, true if black
+     "across": [["1", "Feline pet"], ...],      clue numbers and texts in reading order
+     "down": [["1", "..."], ...],
+     "answers": ["CAT", ...]}                   joined, the letters of the open cells
+
+Record fixtures once with network access, then replay them:
+    python -m modules.Benchmark --corpus DIR --fixtures DIR --record
+    python -m modules.Benchmark --corpus DIR --fixtures DIR --output after.json --baseline before.json
+"""
+
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import platform
+import subprocess
+import time
+import CROSSWALKER
+from modules import ClueArchive
+from modules import HttpCache
+from modules import PuzzleArchive
+from modules import Settings
+
+STAGES = ('load', 'candidates', 'search', 'fill')
+
+FIXTURES_DIR = os.path.join(Settings.DATA_DIR, 'fixtures')
+
+
+def loadCorpus(path):
+    """
+    Returns the puzzles of a puzzle archive, by date, or of a corpus directory, by
+    file name.
+
+    """
+    if os.path.isfile(path):
+        return list(PuzzleArchive.PuzzleArchive(path).puzzles())
+    puzzles = []
+    for name in sorted(glob.glob(os.path.join(path, '*.json'))):
+        with open(name, encoding='utf-8') as f:
+            puzzle = json.load(f)
+        puzzle.setdefault('date', os.path.splitext(os.path.basename(name))[0])
+        puzzles.append(puzzle)
+    return puzzles
+
+
+def truthGrid(puzzle):
+    """
+    Returns the N x N grid of the puzzle's answer letters, '' on black cells.
+
+    """
+    letters = iter(''.join(puzzle['answers']).upper())
+    n = int(len(puzzle['cells']) ** 0.5)
+    return [['' if puzzle['cells'][r * n + c] else next(letters) for c in range(n)] for r in range(n)]
+
+
+def score(solver, grid, truth):
+    """
+    Returns how many open cells and answers grid has right, and their shares.
+
+    """
+    open_cells = [(r, c) for r, row in enumerate(truth) for c, letter in enumerate(row) if letter]
+    letters = sum(1 for r, c in open_cells if grid[r][c] == truth[r][c])
+    words = sum(1 for clue in solver.clues.values()
+                if all(grid[r][c] == truth[r][c] for r, c in clue.letter_positions))
+    return {
+        'cells': len(open_cells),
+        'letters': letters,
+        'letter_accuracy': round(letters / len(open_cells), 4) if open_cells else 0.0,
+        'words': words,
+        'word_accuracy': round(words / len(solver.clues), 4) if solver.clues else 0.0,
+    }
+
+
+def runPuzzle(puzzle, method='bnb', concurrent=True, use_store=False, verbose=False):
+    """
+    Solves one archived puzzle through the full pipeline.
+
+    ...
+
+    Returns
+    -------
+    result : dict
+        date, size, clues, seconds per stage, candidates found, the solution (rows of
+        letters, '#' on black cells and '.' on open cells left blank) and its scores,
+        see score
+
+    """
+    timings = dict()
+    out = None if verbose else io.StringIO()
+    with contextlib.redirect_stdout(out) if out else contextlib.nullcontext():
+        start = time.perf_counter()
+        solver = CROSSWALKER.CROSSWALKER(use_store=use_store)
+        solver.initClues(archived=(puzzle['cells'], puzzle['across'], puzzle['down'],
+                                   puzzle['answers'], puzzle['date']))
+        timings['load'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        solver.initCandidates(concurrent=concurrent)
+        timings['candidates'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        grid = solver.search(method)
+        timings['search'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        grid = solver.fillBlankSpaces(grid)
+        timings['fill'] = time.perf_counter() - start
+
+    truth = truthGrid(puzzle)
+    return {
+        'date': puzzle['date'],
+        'size': solver.N,
+        'clues': len(solver.clues),
+        'seconds': {stage: round(timings[stage], 4) for stage in STAGES},
+        'total_seconds': round(sum(timings.values()), 4),
+        'candidates': sum(len(clue.candidates) for clue in solver.clues.values()),
+        'solution': [''.join(grid[r][c] or ('.' if letter else '#') for c, letter in enumerate(row))
+                     for r, row in enumerate(truth)],
+        'answers_in_candidates': sum(
+            1 for clue in solver.clues.values()
+            if ''.join(truth[r][c] for r, c in clue.letter_positions) in clue.scores),
+        **score(solver, grid, truth),
+    }
+
+
+def summarize(results):
+    """
+    Returns totals and averages over the puzzle results.
+
+    """
+    cells = sum(result['cells'] for result in results)
+    clues = sum(result['clues'] for result in results)
+    return {
+        'puzzles': len(results),
+        'seconds': {stage: round(sum(result['seconds'][stage] for result in results), 4)
+                    for stage in STAGES},
+        'total_seconds': round(sum(result['total_seconds'] for result in results), 4),
+        'letter_accuracy': round(sum(result['letters'] for result in results) / cells, 4) if cells else 0.0,
+        'word_accuracy': round(sum(result['words'] for result in results) / clues, 4) if clues else 0.0,
+        'answers_in_candidates': round(sum(result['answers_in_candidates'] for result in results) / clues, 4)
+                                 if clues else 0.0,
+    }
+
+
+def revision():
+    """
+    Returns the git commit of the working tree, if there is one.
+
+    """
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report, baseline):
+    """
+    Returns printable lines of how the summary of report differs from baseline's.
+
+    """
+    before, after = baseline['summary'], report['summary']
+    lines = [f'Compared with {baseline.get("revision") or "baseline"}']
+    for stage in STAGES:
+        lines.append(f'\t{stage + " seconds":<24} {before["seconds"][stage]:>10.3f} {after["seconds"][stage]:>10.3f}')
+    for key in ('total_seconds', 'letter_accuracy', 'word_accuracy', 'answers_in_candidates'):
+        lines.append(f'\t{key:<24} {before[key]:>10.3f} {after[key]:>10.3f}')
+    return lines
+
+
+def run(corpus, fixtures=FIXTURES_DIR, record=False, method='bnb', concurrent=True,
+        use_store=False, archive=None, verbose=False):
+    """
+    Runs the benchmark over a corpus.
+
+    ...
+
+    Parameters
+    ----------
+    corpus : str
+        puzzle archive or corpus directory, see the module docstring
+    fixtures : str, optional
+        HttpCache directory the source pages are played back from. The default is
+        FIXTURES_DIR.
+    record : bool, optional
+        fetch and store pages missing from the fixtures instead of failing on them.
+        The default is False.
+    method : str, optional
+        search method, see CROSSWALKER.search. The default is 'bnb'.
+    concurrent : bool, optional
+        fetch candidates on a thread pool. The default is True.
+    use_store : bool, optional
+        use the candidate store, which makes later runs skip the filters. The default
+        is False.
+    archive : str, optional
+        puzzle archive used to score candidates. The default is None, no archive,
+        since the corpus answers are likely in it.
+    verbose : bool, optional
+        let the pipeline print. The default is False.
+
+    Returns
+    -------
+    report : dict
+        revision, settings, per-puzzle results and their summary
+
+    """
+    HttpCache.useDirectory(fixtures)
+    HttpCache.setOffline(not record)
+    ClueArchive.usePath(archive)
+
+    results = [runPuzzle(puzzle, method, concurrent, use_store, verbose) for puzzle in loadCorpus(corpus)]
+    return {
+        'revision': revision(),
+        'python': platform.python_version(),
+        'settings': {'method': method, 'concurrent': concurrent, 'candidate_store': use_store,
+                     'archive': archive is not None, 'record': record},
+        'puzzles': results,
+        'summary': summarize(results),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark CROSSWALKER on archived puzzles, offline.')
+    parser.add_argument('--corpus', required=True, help='puzzle archive, or directory of archived puzzles with one JSON file each')
+    parser.add_argument('--fixtures', default=FIXTURES_DIR, help='HttpCache directory of recorded pages')
+    parser.add_argument('--record', action='store_true', help='fetch and record pages missing from the fixtures')
+    parser.add_argument('--solver', choices=['bnb', 'leave-one-out', 'portfolio'], default='bnb')
+    parser.add_argument('--serial', action='store_true', help='fetch candidates one clue and source at a time')
+    parser.add_argument('--candidate-store', action='store_true', help='use the candidate store')
+    parser.add_argument('--archive', help='puzzle archive to score candidates with')
+    parser.add_argument('--output', help='write the report to this file instead of printing it')
+    parser.add_argument('--baseline', help='report of an earlier run to compare the summary with')
+    parser.add_argument('--verbose', action='store_true', help='show what the pipeline prints')
+    args = parser.parse_args()
+
+    report = run(args.corpus, args.fixtures, args.record, args.solver, not args.serial,
+                 args.candidate_store, args.archive, args.verbose)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            print('\n'.join(compare(report, json.load(f))))
+
+
+if __name__ == '__main__':
+    main()
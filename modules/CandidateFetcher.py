@@ -0,0 +1,118 @@
+"""
+Gathers candidates from many (clue, source) pairs at once on a pool of threads. Every
+source call is mostly waiting on the network, so running them side by side makes
+the total time about that of the slowest call instead of the sum of all of them.
+
+The threads are daemon threads: a call that hangs past its timeout is left behind
+without keeping the process from exiting, and a fresh thread takes its place.
+"""
+
+import queue
+import threading
+import time
+from collections import defaultdict
+
+MAX_WORKERS = 16        # Number of source calls in flight at once
+DEFAULT_TIMEOUT = 60    # Seconds a source call may run if the source has no timeout of its own
+
+
+class Job:
+    """
+    A single source call: fn() returns the candidates of source for clue key.
+
+    """
+
+    def __init__(self, key, source, fn):
+        self.key = key
+        self.source = source
+        self.fn = fn
+        self.started = None
+
+
+def _work(todo, done):
+    # Runs jobs until there are none left, reporting (job, candidates, error) for each
+    while True:
+        try:
+            job = todo.get_nowait()
+        except queue.Empty:
+            return
+        job.started = time.monotonic()
+        try:
+            done.put((job, job.fn(), None))
+        except Exception as e:
+            done.put((job, None, e))
+
+
+def _startWorker(todo, done):
+    threading.Thread(target=_work, args=(todo, done), name='CandidateFetcher', daemon=True).start()
+
+
+def fetchConcurrent(jobs, timeouts=None, max_workers=MAX_WORKERS, on_result=None):
+    """
+    Runs all jobs on a pool of threads and merges their candidates as they arrive. A
+    job that runs longer than its source's timeout is abandoned and contributes nothing,
+    just like a job that raises. Its result is dropped if it comes in later.
+
+    ...
+
+    Parameters
+    ----------
+    jobs : list
+        list of Job objects
+    timeouts : dict, optional
+        source -> seconds a single call of that source may take. The default is None,
+        which gives every source DEFAULT_TIMEOUT.
+    max_workers : int, optional
+        number of threads. The default is MAX_WORKERS.
+    on_result : function, optional
+        called as on_result(job, candidates) from this thread as each job finishes in
+        time.
+
+    Returns
+    -------
+    results : dict
+        key -> set of candidates merged over all sources of that key
+
+    """
+    timeouts = timeouts or {}
+    results = defaultdict(set)
+    if not jobs:
+        return results
+
+    todo = queue.Queue()
+    for job in jobs:
+        todo.put(job)
+    done = queue.Queue()
+    for _ in range(min(max_workers, len(jobs))):
+        _startWorker(todo, done)
+
+    pending = set(jobs)
+    while pending:
+        # Sleep until something finishes or the earliest running job runs out of time.
+        # Jobs still waiting for a thread have not started their clock yet.
+        deadlines = [job.started + timeouts.get(job.source, DEFAULT_TIMEOUT)
+                     for job in pending if job.started is not None]
+        timeout = max(0.0, min(deadlines) - time.monotonic()) if deadlines else 1.0
+        try:
+            job, candidates, error = done.get(timeout=timeout)
+        except queue.Empty:
+            pass
+        else:
+            if job in pending:
+                pending.discard(job)
+                if error is not None:
+                    print(f'\t{job.source} failed for {job.key}: {error!r}')
+                else:
+                    results[job.key].update(candidates)
+                    if on_result:
+                        on_result(job, candidates)
+
+        now = time.monotonic()
+        for job in list(pending):
+            if job.started is not None and now - job.started >= timeouts.get(job.source, DEFAULT_TIMEOUT):
+                print(f'\t{job.source} timed out for {job.key}')
+                pending.discard(job)
+                # The abandoned call keeps its thread, give the jobs still waiting another
+                if not todo.empty():
+                    _startWorker(todo, done)
+    return results
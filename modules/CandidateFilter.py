@@ -0,0 +1,196 @@
+"""
+Single-pass candidate cleaning. The filters of CROSSWALKER.cleanCandidates run as a chain
+of generator stages, so every raw word flows through all of them once and no stage
+builds a set of its own. Cheap checks come first: a word can only lose letters on the
+way, so anything shorter than the answer is dropped before any regex or set lookup.
+Past that, a word only goes on if it is the answer's length or cutting a word of the clue
+out of it can make it so, which leaves little for the stopword and clue word checks.
+
+The result is the same as running removeNonAlphabetic, unplural, removeStopwords,
+removeClueWords, fitLength and removeMeaningless one after the other. Every stage counts
+the words it lets through; totals over all calls are kept for report(), and go to
+Metrics as filter_words when metrics are on.
+"""
+
+import itertools
+import re
+import threading
+from collections import Counter
+from operator import itemgetter
+from modules import Lexicon
+from modules import Metrics
+
+STAGES = ('input', 'length window', 'alphabetic', 'unplural', 'stopwords', 'clue words', 'dictionary')
+
+_NON_ALPHABETIC = re.compile('[^a-zA-Z]')
+
+_lock = threading.Lock()
+_totals = Counter()     # stage -> words let through, over all calls
+
+
+def _counted(words, counters, stage):
+    # zip pulls from words before the counter, so once words run out the counter's
+    # next value is the number of words that went through. No Python code runs per word
+    counter = itertools.count()
+    counters.append((stage, counter))
+    return map(itemgetter(0), zip(words, counter))
+
+
+def lengthWindow(words, length):
+    """
+    Drops words too short to ever become length letters long.
+
+    """
+    return (word for word in words if len(word) >= length)
+
+
+def usefulLengths(clue, length):
+    """
+    Returns a test of whether a word of n letters can still become length letters long:
+    either it is already, or cutting every copy of some word of the clue out of it
+    takes it there.
+
+    """
+    parts = {len(word) for word in clue.upper().split(' ') if word}
+    cache = {}
+
+    def useful(n):
+        ok = cache.get(n)
+        if ok is None:
+            ok = cache[n] = n == length or (n > length and any((n - length) % part == 0 for part in parts))
+        return ok
+    return useful
+
+
+def alphabetic(words, useful):
+    """
+    Strips everything but letters, dropping repeats and words that can't become the
+    right length, as they are or as singulars.
+
+    """
+    seen = set()
+    for word in words:
+        if not (word.isascii() and word.isalpha()):
+            word = _NON_ALPHABETIC.sub('', word)
+        if word in seen:
+            continue
+        seen.add(word)
+        if useful(len(word)) or (word[-1:] == 's' and useful(len(word) - 1)):
+            yield word
+
+
+def unplural(words, useful):
+    """
+    Keeps the words that can become the right length, and adds the singular of words
+    ending in s if it can.
+
+    """
+    for word in words:
+        if useful(len(word)):
+            yield word
+        if word[-1] == 's' and useful(len(word) - 1):
+            yield word[:-1]
+
+
+def stopwords(words):
+    """
+    Drops stopwords and uppercases the rest.
+
+    """
+    stop = Lexicon.candidateStopwords()
+    return (word.upper() for word in words if word.lower() not in stop)
+
+
+def clueWords(words, clue, length):
+    """
+    Drops words of the clue and keeps the words of the right length, as they are or
+    with a word of the clue cut out of them.
+
+    """
+    clue_words = clue.upper().split(' ')
+    members = set(clue_words)
+    parts = [word for word in members if word]
+    for word in words:
+        if word in members:
+            continue
+        if len(word) == length:
+            yield word
+        elif len(word) > length:
+            for part in parts:
+                if part in word:
+                    cut = word.replace(part, '')
+                    if len(cut) == length:
+                        yield cut
+
+
+def clean(clue, candidates, length, counts=None):
+    """
+    Cleans raw candidates in one pass.
+
+    ...
+
+    Parameters
+    ----------
+    clue : str
+        clue text, its words can't be the answer
+    candidates : iterable
+        raw candidates
+    length : int
+        length of the answer
+    counts : Counter, optional
+        gets the number of words each stage let through added to it, see STAGES.
+        The default is None.
+
+    Returns
+    -------
+    candidates : set
+        uppercase candidates of the right length that are in the dictionary
+
+    """
+    useful = usefulLengths(clue, length)
+    counters = []
+    words = _counted(candidates, counters, 'input')
+    words = _counted(lengthWindow(words, length), counters, 'length window')
+    words = _counted(alphabetic(words, useful), counters, 'alphabetic')
+    words = _counted(unplural(words, useful), counters, 'unplural')
+    words = _counted(stopwords(words), counters, 'stopwords')
+    words = _counted(clueWords(words, clue, length), counters, 'clue words')
+    # The stages before the dictionary run interleaved, so they can only be timed together
+    with Metrics.span('filter', stage='single pass'):
+        words = set(words)
+    with Metrics.span('filter', stage='dictionary'):
+        valid = Lexicon.checkMany(words)
+
+    local = Counter({stage: next(counter) for stage, counter in counters})
+    local['dictionary'] = len(valid)
+
+    if counts is not None:
+        counts.update(local)
+    with _lock:
+        _totals.update(local)
+    if Metrics.ENABLED:
+        for stage, words in local.items():
+            Metrics.count('filter_words', words, stage=stage)
+    return valid
+
+
+def totals():
+    """
+    Returns stage -> words let through, summed over every call of clean.
+
+    """
+    with _lock:
+        return Counter(_totals)
+
+
+def report():
+    """
+    Returns a printable report of how many words every stage let through.
+
+    """
+    counts = totals()
+    lines = ['Candidate filter (stage, words out, share of input)']
+    for stage in STAGES:
+        share = counts[stage] / counts['input'] if counts['input'] else 0.0
+        lines.append(f'\t{stage:<16} {counts[stage]:>10} {share:>8.1%}')
+    return '\n'.join(lines)
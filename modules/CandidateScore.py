@@ -0,0 +1,57 @@
+"""
+Scores the cleaned candidates of a clue, so the search can try likely answers first.
+A candidate scores for every source that found it, for how often it was mentioned in
+the fetched text (with diminishing returns), and for being a known answer in the clue
+archive, most of all a known answer to the same clue.
+"""
+
+import math
+from collections import Counter
+from modules import ClueArchive
+
+SOURCE_WEIGHT = 1.0         # per source that found the candidate
+FREQUENCY_WEIGHT = 0.5      # times log(1 + mentions over all sources)
+ARCHIVE_WEIGHT = 1.0        # the candidate answered some clue before
+SAME_CLUE_WEIGHT = 3.0      # the candidate answered this very clue before
+
+
+def scoreCandidates(by_source, clue=None, use_archive=True):
+    """
+    Scores the candidates found by each source.
+
+    ...
+
+    Parameters
+    ----------
+    by_source : dict
+        source name -> cleaned candidates, a Counter of mentions or any iterable of words
+    clue : str, optional
+        clue text, to look the clue up in the archive. The default is None.
+    use_archive : bool, optional
+        whether to look candidates up in the clue archive. The default is True.
+
+    Returns
+    -------
+    scores : dict
+        candidate -> score, higher is more likely
+
+    """
+    sources = Counter()
+    mentions = Counter()
+    for candidates in by_source.values():
+        counts = candidates if isinstance(candidates, Counter) else Counter(candidates)
+        sources.update(counts.keys())
+        mentions.update(counts)
+
+    known = ClueArchive.answers() if use_archive else frozenset()
+    same_clue = ClueArchive.answersFor(clue) if use_archive and clue else set()
+
+    scores = dict()
+    for word, found_by in sources.items():
+        score = SOURCE_WEIGHT * found_by + FREQUENCY_WEIGHT * math.log1p(mentions[word])
+        if word in known:
+            score += ARCHIVE_WEIGHT
+        if word in same_clue:
+            score += SAME_CLUE_WEIGHT
+        scores[word] = score
+    return scores
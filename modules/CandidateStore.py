@@ -0,0 +1,95 @@
+"""
+SQLite-backed store of cleaned candidates and their mention counts, keyed by normalized clue text, answer
+length, clue type and source. Clues repeat a lot, and a stored set skips both the
+source's network calls and the filter pipeline. Every entry records the version of
+the filter pipeline that produced it, entries of any other version are ignored.
+"""
+
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+
+
+def normalizeClue(clue):
+    """
+    Returns the clue in a canonical form, so that clues differing only in case,
+    whitespace or quote style share their stored candidates.
+
+    """
+    clue = clue.lower().replace('“', '"').replace('”', '"').replace('’', "'")
+    return re.sub(r'\s+', ' ', clue).strip()
+
+
+class CandidateStore:
+    """
+    Persistent (clue, length, clue type, source) -> cleaned candidate counts mapping.
+
+    ...
+
+    Parameters
+    ----------
+    path : str
+        path of the SQLite database
+    version : int
+        version of the filter pipeline, entries stored by any other version are misses
+
+    """
+
+    def __init__(self, path, version):
+        self.version = version
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS candidates (
+                clue TEXT NOT NULL,
+                length INTEGER NOT NULL,
+                clue_type TEXT NOT NULL,
+                source TEXT NOT NULL,
+                version INTEGER NOT NULL,
+                words TEXT NOT NULL,
+                created REAL NOT NULL,
+                PRIMARY KEY (clue, length, clue_type, source)
+            )""")
+        self._db.commit()
+
+    def get(self, clue, length, clue_type, source):
+        """
+        Returns the stored candidates as a Counter of mentions, or None if there is none
+        for this filter version.
+
+        """
+        with self._lock:
+            row = self._db.execute(
+                'SELECT words FROM candidates WHERE clue = ? AND length = ? AND clue_type = ? AND source = ? AND version = ?',
+                (normalizeClue(clue), length, clue_type or '', source, self.version)).fetchone()
+        if row is None:
+            return None
+        # Entries written before counts were kept are word lists, counted once each
+        return Counter(json.loads(row[0]))
+
+    def put(self, clue, length, clue_type, source, candidates):
+        """
+        Stores cleaned candidates, a Counter of mentions or any iterable of words,
+        replacing whatever was stored for the same key.
+
+        """
+        counts = candidates if isinstance(candidates, Counter) else Counter(candidates)
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO candidates VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (normalizeClue(clue), length, clue_type or '', source, self.version,
+                 json.dumps(dict(sorted(counts.items()))), time.time()))
+            self._db.commit()
+
+    def prune(self):
+        """
+        Deletes entries left behind by other versions of the filter pipeline.
+
+        """
+        with self._lock:
+            deleted = self._db.execute('DELETE FROM candidates WHERE version != ?', (self.version,)).rowcount
+            self._db.commit()
+        return deleted
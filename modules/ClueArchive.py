@@ -0,0 +1,99 @@
+"""
+Read access to the answers of the puzzle archive (see PuzzleArchive) for scoring
+candidates. Answers that were already used, and above all answers already given to the
+same clue, are likely answers again.
+
+The archive is the shared one under Settings.DATA_DIR, or the database CROSSWALKER_ARCHIVE
+points to. Its set of answers is read once per process, answers to a clue are looked up
+through the archive's clue index.
+
+The puzzle being solved may be archived already, scraping saves it before it is solved.
+Call exclude with its date so that its own answers are never looked up.
+"""
+
+import os
+import threading
+from modules import PuzzleArchive
+from modules import Settings
+
+ARCHIVE_PATH = os.environ.get('CROSSWALKER_ARCHIVE') or os.path.join(Settings.DATA_DIR, PuzzleArchive.FILE_NAME)
+
+_lock = threading.Lock()
+_archive = None         # the open PuzzleArchive, or False if there is none
+_answers = None         # every answer in the archive
+_excluded = None        # date of the puzzle left out of every lookup
+_excluded_pairs = None  # its (normalized clue, answer) -> times
+
+
+def _open():
+    global _archive, _answers, _excluded_pairs
+    with _lock:
+        if _archive is None:
+            _archive = PuzzleArchive.PuzzleArchive(ARCHIVE_PATH) if ARCHIVE_PATH else False
+        if _answers is None:
+            _answers = frozenset(_archive.answers(_excluded)) if _archive else frozenset()
+            _excluded_pairs = dict()
+            if _archive and _excluded:
+                rows = _archive.puzzlePairs(_excluded)
+                _excluded_pairs = {(clue, answer): times for clue, answer, times in rows}
+        return _archive
+
+
+def usePath(path):
+    """
+    Reads the archive from path from now on, or uses no archive if path is None.
+
+    """
+    global ARCHIVE_PATH, _archive, _answers
+    with _lock:
+        ARCHIVE_PATH = path
+        _archive = _answers = None
+
+
+def exclude(date):
+    """
+    Leaves the puzzle of date out of every lookup from now on, or no puzzle if date is
+    None.
+
+    """
+    global _excluded, _answers
+    with _lock:
+        _excluded = date
+        _answers = None
+
+
+def answers():
+    """
+    Returns every answer in the archive, uppercase.
+
+    """
+    if _answers is None:
+        _open()
+    return _answers
+
+
+def answersFor(clue):
+    """
+    Returns the answers the archive has for a clue, compared after normalizeClue.
+
+    """
+    archive = _open()
+    return archive.answersFor(clue, _excluded) if archive else set()
+
+
+def excludedPairs():
+    """
+    Returns (normalized clue, answer) -> times of the clues of the excluded puzzle, see
+    exclude.
+
+    """
+    _open()
+    return _excluded_pairs
+
+
+def archive():
+    """
+    Returns the open PuzzleArchive, None if there is none. usePath opens a new one.
+
+    """
+    return _open() or None
@@ -0,0 +1,199 @@
+"""
+Keeps a pool of reusable headless Chrome drivers for every Selenium code path, so that
+Chrome is not started (and leaked) again for each page we need to render.
+"""
+
+import atexit
+import contextlib
+import os
+import queue
+import threading
+import time
+from modules.LazyLoader import lazyImport
+
+webdriver = lazyImport('selenium.webdriver')
+Options = lazyImport('selenium.webdriver.chrome.options', 'Options')
+
+POOL_SIZE = int(os.environ.get('CROSSWALKER_DRIVERS', 2))   # Maximum number of Chrome processes alive at once
+MAX_PAGES = 50                                              # A driver is restarted after serving this many pages
+ACQUIRE_TIMEOUT = 120                                       # Seconds to wait for a free driver before giving up
+
+
+class DriverPool:
+    """
+    Pool of headless Chrome drivers. Drivers are created on demand up to size, checked
+    for health before being handed out, recycled after max_pages pages and all quit at exit.
+
+    ...
+
+    Parameters
+    ----------
+    size : int, optional
+        maximum number of drivers. The default is POOL_SIZE.
+    max_pages : int, optional
+        number of pages a driver serves before it is restarted. The default is MAX_PAGES.
+
+    """
+
+    def __init__(self, size=POOL_SIZE, max_pages=MAX_PAGES):
+        self.size = size
+        self.max_pages = max_pages
+        self._idle = queue.LifoQueue()      # LIFO so the most recently used (warm) driver is reused
+        self._pages = {}                    # driver -> number of pages served
+        self._alive = 0                     # drivers started or starting
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _newDriver(self):
+        """
+        Starts a headless Chrome with the options every call site used to set itself.
+
+        """
+        options = Options()
+        options.add_argument('--ignore-certificate-errors')
+        options.add_argument('--ignore-ssl-errors')
+        options.add_argument('--headless')
+        options.add_argument('--log-level=3')
+        options.add_experimental_option('excludeSwitches', ['enable-logging'])
+        return webdriver.Chrome(options=options)
+
+    def _isHealthy(self, driver):
+        """
+        A driver is healthy if its browser session still answers.
+
+        """
+        try:
+            driver.current_url
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, driver):
+        with self._lock:
+            self._pages.pop(driver, None)
+            self._alive -= 1
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    def acquire(self, timeout=ACQUIRE_TIMEOUT):
+        """
+        Returns a healthy driver, starting a new one if the pool is not full yet,
+        otherwise waiting up to timeout seconds for one to be released.
+
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    if self._closed:
+                        raise RuntimeError('Driver pool is closed')
+                    create = self._alive < self.size
+                    if create:
+                        self._alive += 1            # Reserve the slot while Chrome starts
+                if create:
+                    try:
+                        driver = self._newDriver()
+                    except Exception:
+                        with self._lock:
+                            self._alive -= 1
+                        raise
+                    with self._lock:
+                        self._pages[driver] = 0
+                    return driver
+                # Wake up now and then, a slot may free up when a worn out driver is discarded
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError('No Chrome driver became available')
+                try:
+                    driver = self._idle.get(timeout=min(1.0, remaining))
+                except queue.Empty:
+                    continue
+
+            if self._isHealthy(driver):
+                return driver
+            self._discard(driver)
+
+    def release(self, driver, broken=False):
+        """
+        Gives a driver back to the pool. Broken or worn out drivers are quit instead.
+
+        """
+        with self._lock:
+            pages = self._pages.get(driver, 0) + 1
+            self._pages[driver] = pages
+            keep = not (broken or self._closed or pages >= self.max_pages)
+        if keep:
+            self._idle.put(driver)
+        else:
+            self._discard(driver)
+
+    @contextlib.contextmanager
+    def borrow(self):
+        """
+        Context manager that lends a driver for a single page.
+
+            with pool.borrow() as driver:
+                driver.get(URL)
+
+        """
+        driver = self.acquire()
+        broken = False
+        try:
+            yield driver
+        except Exception:
+            broken = True
+            raise
+        finally:
+            self.release(driver, broken)
+
+    def close(self):
+        """
+        Quits every driver in the pool. Drivers that are borrowed are quit when released.
+
+        """
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def getPool():
+    """
+    Returns the shared pool, creating it (and registering its teardown) on first use.
+
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = DriverPool()
+            atexit.register(_pool.close)
+        return _pool
+
+
+def configure(size=POOL_SIZE, max_pages=MAX_PAGES):
+    """
+    Sets the size and recycling limit of the shared pool. Call before the first borrow().
+
+    """
+    pool = getPool()
+    pool.size = size
+    pool.max_pages = max_pages
+
+
+def borrow():
+    """
+    Borrows a driver from the shared pool, see DriverPool.borrow.
+
+    """
+    return getPool().borrow()
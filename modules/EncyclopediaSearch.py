@@ -3,14 +3,18 @@ Finds candidates for a clue via Encyclopedia.com.
 """
 
 import re
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from bs4 import BeautifulSoup
+from collections import Counter
+from modules import DriverPool
+from modules import HttpCache
+from modules.LazyLoader import lazyImport
+
+BeautifulSoup = lazyImport('bs4', 'BeautifulSoup')
 
 
 def getCandidates(clue):
     """
-    Takes a clue and returns a set of candidates for that clue using Encyclopedia.com.
+    Takes a clue and returns the candidates for that clue using Encyclopedia.com, with
+    the number of times each one turned up.
     
     ...
 
@@ -20,30 +24,32 @@ def getCandidates(clue):
 
     Returns
     -------
-    candidates : set
-        set of candidates obtained via Encyclopedia.com
+    candidates : Counter
+        candidates obtained via Encyclopedia.com -> number of mentions
 
     """
     print('\tGetting Encyclopedia Candidates')
-    candidates = set()
+    candidates = Counter()
     formatted_clue = clue.replace(' ', '+')                 # Clues are formatted to certain type
     URL = f'https://www.encyclopedia.com/gsearch?q={formatted_clue}'
-    options = Options()
-    options.add_argument('--ignore-certificate-errors')
-    options.add_argument('--ignore-ssl-errors')
-    options.add_argument('--headless')
-    options.add_argument('--log-level=3')
-    options.add_experimental_option('excludeSwitches', ['enable-logging'])
-    driver = webdriver.Chrome(options=options)              # After chrome options are set driver called
-    driver.get(URL)
-    soup = BeautifulSoup(driver.page_source, 'html.parser') 
+    page_source = HttpCache.cached(URL, 'encyclopedia', lambda: renderPage(URL))
+    soup = BeautifulSoup(page_source, 'html.parser')
     links = soup.find_all('a', {'class': 'gs-title'})       # Necessary classes are pointed for iteration
 
     for link in links:
         text = link.text
         text.replace(' | Encyclopedia.com', '')             # Unnecessary string is removed from the title
-        candidates.add(text.replace(' ', ''))               # Title text is added to candidate set, removing spaces
+        candidates[text.replace(' ', '')] += 1              # Title text is added to candidates, removing spaces
         words = re.split('[;:,.\-\% ]', text)               # Words from the title are separated according to the given separators and a list is created
         candidates.update(words)                            # The list containing the words is added to candidates set
-    driver.close()
     return candidates
+
+
+def renderPage(URL):
+    """
+    Renders a page in a headless driver borrowed from the shared pool and returns its HTML.
+
+    """
+    with DriverPool.borrow() as driver:
+        driver.get(URL)
+        return driver.page_source.encode('utf-8')
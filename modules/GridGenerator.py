@@ -0,0 +1,365 @@
+"""
+Builds synthetic puzzles of any size to load-test the solver offline. A puzzle is a
+block pattern with 180 degree rotational symmetry, where every answer is at least three
+letters and every open cell connects to every other one, the way published grids are.
+It gets a fill, and every slot gets the true answer plus decoy candidates.
+
+The fill comes from a word list when one is given and MAC search finds one in time,
+and is otherwise random letters. The solver doesn't care whether answers are words,
+only whether candidates agree at the crossings.
+
+Run the load test with:
+    python -m modules.GridGenerator --sizes 5 15 21 [--words FILE] [--seconds 60]
+"""
+
+import argparse
+import json
+import random
+import string
+import time
+from collections import deque
+from modules.LazyLoader import lazyImport
+from modules.MacSearch import MacSearch
+from modules.MaxCspSearch import MaxCspSearch
+from modules.PuzzleModel import PuzzleModel, findSlots, ACROSS, DOWN
+
+np = lazyImport('numpy')
+
+MIN_LENGTH = 3          # Shortest answer allowed in generated grids
+MAX_LENGTH = 9          # Longer answers are broken up once the grid has its share of blocks
+BLOCK_RATIO = 0.16      # Share of black cells aimed for, published 15x15 grids have about 1/6
+NEAR_MISS_RATIO = 0.1   # Share of decoys that are the true answer with one letter changed
+
+
+class Slot:
+    """
+    Stand-in for CROSSWALKER.Clue with just what PuzzleModel and the solver need.
+
+    """
+
+    __slots__ = ('id', 'length', 'letter_positions', 'candidates', 'slot')
+
+    def __init__(self, id, start, heading, length):
+        self.id = id
+        self.length = length
+        self.letter_positions = [(start[0] + i * heading[0], start[1] + i * heading[1])
+                                 for i in range(length)]
+        self.candidates = set()
+        self.slot = None
+
+
+class Puzzle:
+    """
+    A generated puzzle.
+
+    ...
+
+    Attributes
+    ----------
+    cells : numpy.ndarray
+        2D array, True where a cell is filled black
+    slots : list
+        Slot objects, across answers first, with their candidates
+    truth : dict
+        slot id -> true answer
+    filled_from_words : bool
+        whether the fill came from the word list
+
+    """
+
+    def __init__(self, cells, slots, truth, filled_from_words):
+        self.cells = cells
+        self.slots = slots
+        self.truth = truth
+        self.filled_from_words = filled_from_words
+
+
+def _runsOk(cells, r, c, min_length):
+    for line in (cells[r, :], cells[:, c]):
+        length = 0
+        for filled in list(line) + [True]:
+            if filled:
+                if 0 < length < min_length:
+                    return False
+                length = 0
+            else:
+                length += 1
+    return True
+
+
+def _connected(cells):
+    n = len(cells)
+    open_cells = [(r, c) for r in range(n) for c in range(n) if not cells[r][c]]
+    if not open_cells:
+        return False
+    seen = {open_cells[0]}
+    queue = deque(seen)
+    while queue:
+        r, c = queue.popleft()
+        for nr, nc in ((r + 1, c), (r - 1, c), (r, c + 1), (r, c - 1)):
+            if 0 <= nr < n and 0 <= nc < n and not cells[nr][nc] and (nr, nc) not in seen:
+                seen.add((nr, nc))
+                queue.append((nr, nc))
+    return len(seen) == len(open_cells)
+
+
+def _longestRun(cells, r, c):
+    longest = 0
+    for line, i in ((cells[r, :], c), (cells[:, c], r)):
+        start, end = i, i
+        while start > 0 and not line[start - 1]:
+            start -= 1
+        while end < len(line) - 1 and not line[end + 1]:
+            end += 1
+        longest = max(longest, end - start + 1)
+    return longest
+
+
+def blockPattern(n, rng, block_ratio=BLOCK_RATIO, min_length=MIN_LENGTH, max_length=MAX_LENGTH):
+    """
+    Returns an n x n block pattern with rotational symmetry, answers of at least
+    min_length letters and connected open cells. Once there are enough blocks, blocks
+    are only added to break up answers longer than max_length.
+
+    ...
+
+    Parameters
+    ----------
+    n : int
+        side length
+    rng : random.Random
+        source of randomness
+    block_ratio : float, optional
+        share of black cells to aim for. The default is BLOCK_RATIO.
+    min_length : int, optional
+        shortest answer allowed. The default is MIN_LENGTH.
+    max_length : int, optional
+        longest answer aimed for. The default is MAX_LENGTH.
+
+    Returns
+    -------
+    cells : numpy.ndarray
+        2D array, True where a cell is filled black
+
+    """
+    cells = np.zeros((n, n), dtype=bool)
+    target = int(n * n * block_ratio)
+    positions = [(r, c) for r in range(n) for c in range(n)]
+    rng.shuffle(positions)
+
+    blocks = 0
+    for r, c in positions:
+        if blocks >= target and _longestRun(cells, r, c) <= max_length:
+            continue
+        mirror = (n - 1 - r, n - 1 - c)
+        if cells[r, c] or cells[mirror]:
+            continue
+        cells[r, c] = cells[mirror] = True
+        if (_runsOk(cells, r, c, min_length) and _runsOk(cells, *mirror, min_length)
+                and _connected(cells)):
+            blocks += 1 if (r, c) == mirror else 2
+        else:
+            cells[r, c] = cells[mirror] = False
+    return cells
+
+
+def makeSlots(cells):
+    """
+    Returns the Slot objects of a block pattern, named like the solver's clues.
+
+    """
+    across, down = findSlots(cells)
+    slots = [Slot(f'A{i+1}', start, ACROSS, length) for i, (start, length) in enumerate(across)]
+    slots += [Slot(f'D{i+1}', start, DOWN, length) for i, (start, length) in enumerate(down)]
+    return slots
+
+
+def _randomWord(rng, length):
+    return ''.join(rng.choice(string.ascii_uppercase) for _ in range(length))
+
+
+def fillWords(slots, words, rng, seconds):
+    """
+    Tries to fill the slots with words from the word list by MAC search in a random
+    order. Returns slot id -> answer, or None if no fill was found in time.
+
+    """
+    model = PuzzleModel(slots)
+    by_length = {}
+    for word in words:
+        by_length.setdefault(len(word), []).append(word)
+    domains = {slot.slot: set(by_length.get(slot.length, ())) for slot in slots}
+    if not all(domains.values()):
+        return None
+
+    class _Shuffled(MacSearch):
+        def orderValues(self, var, assignment):
+            words = list(self.domains[var])
+            rng.shuffle(words)
+            return words
+
+    deadline = time.monotonic() + seconds
+    search = _Shuffled(domains, model.arcs())
+    leaves = search.leaves()
+    try:
+        for items, complete in leaves:
+            if complete:
+                return dict(model.toIds(items))
+            if time.monotonic() >= deadline:
+                return None
+    finally:
+        leaves.close()
+    return None
+
+
+def makePuzzle(n, decoys=50, drop=0, words=None, seed=0, fill_seconds=30):
+    """
+    Generates a puzzle with candidates for every slot.
+
+    ...
+
+    Parameters
+    ----------
+    n : int
+        side length
+    decoys : int, optional
+        wrong candidates per slot. The default is 50.
+    drop : int, optional
+        number of slots whose true answer is left out of the candidates, like a clue
+        none of the sources got right. The default is 0.
+    words : list, optional
+        word list to fill the grid and draw decoys from. The default is None, which
+        uses random letters.
+    seed : int, optional
+        seed of the random choices. The default is 0.
+    fill_seconds : float, optional
+        time allowed to find a fill from the word list. The default is 30.
+
+    Returns
+    -------
+    puzzle : Puzzle
+
+    """
+    rng = random.Random(seed)
+    cells = blockPattern(n, rng)
+    slots = makeSlots(cells)
+    words = [word.upper() for word in words or () if word.isalpha()]
+
+    truth = fillWords(slots, words, rng, fill_seconds) if words else None
+    filled_from_words = truth is not None
+    if truth is None:
+        letters = [[_randomWord(rng, 1) for _ in range(n)] for _ in range(n)]
+        truth = {slot.id: ''.join(letters[r][c] for r, c in slot.letter_positions) for slot in slots}
+
+    by_length = {}
+    for word in words:
+        by_length.setdefault(len(word), []).append(word)
+
+    dropped = set(rng.sample([slot.id for slot in slots], min(drop, len(slots))))
+    for slot in slots:
+        answer = truth[slot.id]
+        pool = by_length.get(slot.length)
+        candidates = set()
+        for i in range(decoys):
+            if rng.random() < NEAR_MISS_RATIO:
+                position = rng.randrange(slot.length)
+                candidates.add(answer[:position] + _randomWord(rng, 1) + answer[position + 1:])
+            elif pool:
+                candidates.add(rng.choice(pool))
+            else:
+                candidates.add(_randomWord(rng, slot.length))
+        candidates.add(answer)
+        if slot.id in dropped:
+            candidates.discard(answer)
+        slot.candidates = candidates
+    return Puzzle(cells, slots, truth, filled_from_words)
+
+
+def loadTest(n, decoys=50, drop=0, words=None, seed=0, seconds=60):
+    """
+    Generates a puzzle and solves it with the branch and bound search within seconds.
+
+    ...
+
+    Returns
+    -------
+    report : dict
+        size, slots, crossings, candidates, seconds taken to generate, to find the best
+        solution and to finish the search, search nodes, answers placed and right, share
+        of letters right, and whether the search finished (so the solution is optimal)
+
+    """
+    start = time.perf_counter()
+    puzzle = makePuzzle(n, decoys, drop, words, seed)
+    generated = time.perf_counter() - start
+
+    start = time.perf_counter()
+    model = PuzzleModel(puzzle.slots)
+    search = MaxCspSearch({slot.slot: slot.candidates for slot in puzzle.slots}, model.arcs(),
+                          deadline=time.monotonic() + seconds)
+    found = 0.0
+    for _ in search.improvements():
+        found = time.perf_counter() - start
+    best = model.toIds(search.best or [])
+    solved = time.perf_counter() - start
+
+    grid = {}
+    for id, answer in best:
+        slot = puzzle.slots[model.slots[id]]
+        for pos, letter in zip(slot.letter_positions, answer):
+            grid[pos] = letter
+    open_cells = [(r, c) for r in range(n) for c in range(n) if not puzzle.cells[r][c]]
+    truth_cells = {}
+    for slot in puzzle.slots:
+        for pos, letter in zip(slot.letter_positions, puzzle.truth[slot.id]):
+            truth_cells[pos] = letter
+
+    return {
+        'size': n,
+        'slots': len(puzzle.slots),
+        'crossings': len(model.crossings) // 2,
+        'candidates': sum(len(slot.candidates) for slot in puzzle.slots),
+        'word_fill': puzzle.filled_from_words,
+        'generate_seconds': round(generated, 3),
+        'best_seconds': round(found, 3),
+        'solve_seconds': round(solved, 3),
+        'nodes': search.nodes,
+        'placed': len(best),
+        'correct': sum(1 for id, answer in best if puzzle.truth[id] == answer),
+        'letter_accuracy': round(sum(1 for pos in open_cells if grid.get(pos) == truth_cells[pos])
+                                 / len(open_cells), 3),
+        'optimal': search.exhausted,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load-test the solver on generated puzzles.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[5, 15, 21])
+    parser.add_argument('--decoys', type=int, default=50, help='wrong candidates per slot')
+    parser.add_argument('--drop', type=int, default=0,
+                        help='slots whose true answer is missing from the candidates')
+    parser.add_argument('--words', help='word list file to fill grids and draw decoys from')
+    parser.add_argument('--seconds', type=float, default=60, help='time budget of each solve')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', action='store_true', help='print one JSON object per size')
+    args = parser.parse_args()
+
+    words = None
+    if args.words:
+        with open(args.words, encoding='utf-8', errors='ignore') as f:
+            words = [line.strip() for line in f if line.strip()]
+
+    for n in args.sizes:
+        report = loadTest(n, args.decoys, args.drop, words, args.seed, args.seconds)
+        if args.json:
+            print(json.dumps(report))
+        else:
+            print(f'{n}x{n}: {report["slots"]} slots, {report["crossings"]} crossings, '
+                  f'best found in {report["best_seconds"]}s, search {"finished" if report["optimal"] else "stopped"} '
+                  f'after {report["solve_seconds"]}s and {report["nodes"]} nodes, '
+                  f'{report["correct"]}/{report["slots"]} answers and '
+                  f'{report["letter_accuracy"]:.0%} of letters right')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+"""
+Finds candidates for a clue among the answers of past puzzles, see PuzzleArchive.
+
+Clues repeat a lot, word for word or nearly so, and an answer found in the archive is
+thousands of times cheaper than one scraped from the web. A clue is looked up exactly,
+after normalizeClue, and fuzzily: archived clues sharing enough of its letter trigrams
+count as similar. The archive is read into memory once per process, after which a
+lookup takes about a millisecond. The clues of the puzzle ClueArchive excludes, the one
+being solved, are taken back out of every lookup.
+"""
+
+import re
+import threading
+from collections import Counter, defaultdict
+from modules import ClueArchive
+from modules.CandidateStore import normalizeClue
+
+SIMILARITY = 0.6        # Least Jaccard similarity of trigram sets for clues to count as similar
+
+_NON_ALPHANUMERIC = re.compile('[^a-z0-9 ]')
+
+_lock = threading.Lock()
+_index = None           # HistoryIndex of _indexed
+_indexed = None
+
+
+def trigrams(text):
+    """
+    Returns the set of letter trigrams of a normalized clue, punctuation left out and
+    the ends padded with a space.
+
+    """
+    text = f' {_NON_ALPHANUMERIC.sub("", text)} '
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class HistoryIndex:
+    """
+    Exact and trigram index of archived clues, split by answer length so that a lookup
+    only ever sees answers that fit.
+
+    ...
+
+    Parameters
+    ----------
+    pairs : iterable
+        (normalized clue, answer, times archived) rows
+
+    """
+
+    def __init__(self, pairs):
+        self.exact = dict()                     # (normalized clue, length) -> {answer: times}
+        for clue, answer, times in pairs:
+            key = (clue, len(answer))
+            answers = self.exact.get(key)
+            if answers is None:
+                answers = self.exact[key] = dict()
+            answers[answer] = answers.get(answer, 0) + times
+
+        self.keys = list(self.exact)            # entry index -> (normalized clue, length)
+        self.sizes = []                         # entry index -> number of trigrams
+        self.postings = dict()                  # length -> trigram -> entry indexes
+        for index, (clue, length) in enumerate(self.keys):
+            grams = trigrams(clue)
+            self.sizes.append(len(grams))
+            postings = self.postings.get(length)
+            if postings is None:
+                postings = self.postings[length] = defaultdict(list)
+            for gram in grams:
+                postings[gram].append(index)
+
+    def answers(self, key, exclude=None):
+        """
+        Returns answer -> times of an entry, less the times exclude has for them.
+
+        """
+        answers = self.exact.get(key, {})
+        if not exclude:
+            return Counter(answers)
+        return Counter({answer: times - exclude.get((key[0], answer), 0) for answer, times in answers.items()
+                        if times > exclude.get((key[0], answer), 0)})
+
+    def search(self, clue, length, similarity=SIMILARITY, exclude=None):
+        """
+        Looks a clue up.
+
+        ...
+
+        Parameters
+        ----------
+        clue : str
+        length : int
+            length of the answer
+        similarity : float, optional
+            least Jaccard similarity of the trigram sets of similar clues. The default
+            is SIMILARITY.
+        exclude : dict, optional
+            (normalized clue, answer) -> times to leave out, see
+            ClueArchive.excludedPairs. The default is None.
+
+        Returns
+        -------
+        exact : Counter
+            answers archived for this very clue -> times
+        similar : Counter
+            answers archived for similar clues -> times, the exact ones included
+
+        """
+        normalized = normalizeClue(clue)
+        grams = trigrams(normalized)
+        postings = self.postings.get(length, {})
+        shared = Counter()
+        for gram in grams:
+            shared.update(postings.get(gram, ()))
+
+        similar = Counter()
+        for index, common in shared.items():
+            if common / (len(grams) + self.sizes[index] - common) >= similarity:
+                similar.update(self.answers(self.keys[index], exclude))
+        exact = self.answers((normalized, length), exclude)
+        return exact, similar | exact
+
+
+def index():
+    """
+    Returns the index of the clue archive, built the first time it is asked for and
+    again whenever ClueArchive opens another archive.
+
+    """
+    global _index, _indexed
+    archive = ClueArchive.archive()
+    with _lock:
+        if _index is None or _indexed is not archive:
+            _indexed = archive
+            _index = HistoryIndex(archive.pairs() if archive else ())
+        return _index
+
+
+def search(clue, length):
+    """
+    Returns the (exact, similar) answers of the clue archive, see HistoryIndex.search.
+
+    """
+    return index().search(clue, length, exclude=ClueArchive.excludedPairs())
+
+
+def getCandidates(clue, length):
+    """
+    Takes a clue and returns the answers given to it, or to clues like it, in past
+    puzzles.
+
+    ...
+
+    Parameters
+    ----------
+    clue : str
+    length : int
+        length of the related answer.
+
+    Returns
+    -------
+    candidates : Counter
+        past answers of the right length -> number of archived clues that had them
+
+    """
+    exact, similar = search(clue, length)
+    return similar
@@ -0,0 +1,252 @@
+"""
+Persistent on-disk cache for every page the sources fetch. Bodies are stored in files
+named after the SHA-256 of their URL (or key), an SQLite index keeps their age and last
+use so that stale entries are refetched and the least recently used ones are evicted
+once the cache grows past MAX_BYTES. In offline mode only cached pages are served.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from modules import HttpClient
+from modules import Metrics
+from modules import Settings
+
+DAY = 24 * 60 * 60
+
+# How long a cached page stays fresh, per source
+SOURCE_TTLS = {
+    'merriam': 30 * DAY,
+    'wikipedia': 7 * DAY,
+    'encyclopedia': 30 * DAY,
+    'nyt': 60 * 60,
+}
+DEFAULT_TTL = DAY
+MAX_BYTES = int(os.environ.get('CROSSWALKER_CACHE_BYTES', 512 * 1024 * 1024))
+
+# HTTP statuses that are worth remembering, so that e.g. missing dictionary pages are not asked for again
+NEGATIVE_STATUSES = {404, 410}
+
+OFFLINE = os.environ.get('CROSSWALKER_OFFLINE', '') not in ('', '0')
+
+
+class CacheMiss(OSError):
+    """
+    Raised in offline mode when a page is not in the cache.
+
+    """
+
+
+class NotFound(OSError):
+    """
+    Raised when the page does not exist, whether we just asked or remembered it from before.
+
+    """
+
+
+class HttpCache:
+    """
+    Content-addressed response cache kept in directory.
+
+    ...
+
+    Parameters
+    ----------
+    directory : str
+        directory holding the index and the bodies
+    max_bytes : int, optional
+        total size of bodies kept before least recently used ones are evicted. The default is MAX_BYTES.
+
+    """
+
+    def __init__(self, directory, max_bytes=MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(directory, 'index.sqlite'), check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                source TEXT NOT NULL,
+                status INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                fetched REAL NOT NULL,
+                accessed REAL NOT NULL
+            )""")
+        self._db.execute('CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)')
+        self._db.commit()
+        # Running total of the body sizes, so storing a page does not sum the whole index
+        self._total = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def lookup(self, url, source, stale_ok=False):
+        """
+        Returns (status, body) for a cached url, or None if it is missing or stale.
+
+        """
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        with self._lock:
+            row = self._db.execute('SELECT status, fetched FROM entries WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            status, fetched = row
+            if not stale_ok and time.time() - fetched > SOURCE_TTLS.get(source, DEFAULT_TTL):
+                return None
+            try:
+                with open(self._path(key), 'rb') as f:
+                    body = f.read()
+            except OSError:
+                self._total -= self._db.execute('SELECT size FROM entries WHERE key = ?', (key,)).fetchone()[0]
+                self._db.execute('DELETE FROM entries WHERE key = ?', (key,))
+                self._db.commit()
+                return None
+            self._db.execute('UPDATE entries SET accessed = ? WHERE key = ?', (time.time(), key))
+            self._db.commit()
+        return status, body
+
+    def store(self, url, source, body, status=200):
+        """
+        Saves a response body for url and evicts old entries if the cache is too big.
+
+        """
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f'{path}.{threading.get_ident()}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(body)
+        os.replace(tmp, path)
+        now = time.time()
+        with self._lock:
+            old = self._db.execute('SELECT size FROM entries WHERE key = ?', (key,)).fetchone()
+            self._db.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)',
+                             (key, url, source, status, len(body), now, now))
+            self._db.commit()
+            self._total += len(body) - (old[0] if old else 0)
+            if self._total > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """
+        Removes least recently used entries until the bodies fit in max_bytes. Other
+        processes may share the cache, so the total is counted again first.
+
+        """
+        total = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        if total <= self.max_bytes:
+            self._total = total
+            return
+        victims = []
+        for key, size in self._db.execute('SELECT key, size FROM entries ORDER BY accessed'):
+            if total <= self.max_bytes:
+                break
+            victims.append(key)
+            total -= size
+        for key in victims:
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+        self._db.executemany('DELETE FROM entries WHERE key = ?', [(key,) for key in victims])
+        self._db.commit()
+        self._total = total
+
+    def cached(self, url, source, producer):
+        """
+        Returns the cached body for url, calling producer() to get and cache it when it is
+        missing or stale. In offline mode stale entries are served and misses raise CacheMiss.
+
+        """
+        hit = self.lookup(url, source, stale_ok=OFFLINE)
+        Metrics.count('http_cache_lookups', source=source, result='miss' if hit is None else 'hit')
+        if hit is None and OFFLINE:
+            raise CacheMiss(f'{url} is not cached')
+        if hit is None:
+            try:
+                with Metrics.span('http_fetch', source=source):
+                    body = producer()
+            except HttpClient.HttpStatusError as e:
+                if e.code not in NEGATIVE_STATUSES:
+                    raise
+                self.store(url, source, b'', status=e.code)
+                raise NotFound(f'{url} returned {e.code}') from e
+            self.store(url, source, body)
+            return body
+        status, body = hit
+        if status in NEGATIVE_STATUSES:
+            raise NotFound(f'{url} returned {status}')
+        return body
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def getCache():
+    """
+    Returns the shared cache under Settings.DATA_DIR, opening it on first use.
+
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = HttpCache(os.path.dirname(Settings.dataPath('http', 'index.sqlite')))
+        return _cache
+
+
+def useDirectory(directory):
+    """
+    Makes the shared cache the one kept in directory, e.g. recorded fixtures to replay.
+
+    """
+    global _cache
+    with _cache_lock:
+        _cache = HttpCache(directory)
+
+
+def setOffline(offline=True):
+    """
+    Turns offline mode on or off. Offline, nothing is fetched and only cached pages are served.
+
+    """
+    global OFFLINE
+    OFFLINE = offline
+
+
+def cached(url, source, producer):
+    """
+    Returns the body for url (or any other unique key) from the shared cache, calling
+    producer() to get it when needed. See HttpCache.cached.
+
+    ...
+
+    Parameters
+    ----------
+    url : str
+        URL or key that identifies the response
+    source : str
+        source name, used to pick the TTL from SOURCE_TTLS
+    producer : function
+        returns the body as bytes
+
+    Returns
+    -------
+    body : bytes
+
+    """
+    return getCache().cached(url, source, producer)
+
+
+def fetch(url, source):
+    """
+    Returns the body of url, from the shared cache if it is there and fresh,
+    otherwise over the pooled connections of HttpClient.
+
+    """
+    return cached(url, source, lambda: HttpClient.get(url))
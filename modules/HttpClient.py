@@ -0,0 +1,97 @@
+"""
+Shared HTTP client for every source. Connections are kept alive in per-host pools,
+so repeated requests to the same site (Merriam-Webster above all) reuse one TCP+TLS
+connection instead of opening a fresh one for every page.
+"""
+
+import os
+import threading
+from modules.LazyLoader import lazyImport
+
+requests = lazyImport('requests')
+HTTPAdapter = lazyImport('requests.adapters', 'HTTPAdapter')
+
+POOL_HOSTS = int(os.environ.get('CROSSWALKER_HTTP_HOSTS', 10))          # Number of hosts to keep pools for
+POOL_MAXSIZE = int(os.environ.get('CROSSWALKER_HTTP_PER_HOST', 8))      # Connections kept alive per host
+TIMEOUT = float(os.environ.get('CROSSWALKER_HTTP_TIMEOUT', 20))         # Seconds to wait for a response
+RETRIES = 2                                                             # Retries of failed connections
+
+_adapter = None
+_local = threading.local()
+_lock = threading.Lock()
+
+
+class HttpStatusError(OSError):
+    """
+    Raised when a page is answered with an error status.
+
+    """
+
+    def __init__(self, url, code):
+        super().__init__(f'{url} returned {code}')
+        self.url = url
+        self.code = code
+
+
+def _getAdapter():
+    """
+    Returns the adapter holding the connection pools, shared by the sessions of all threads.
+
+    """
+    global _adapter
+    with _lock:
+        if _adapter is None:
+            _adapter = HTTPAdapter(pool_connections=POOL_HOSTS, pool_maxsize=POOL_MAXSIZE,
+                                   max_retries=RETRIES, pool_block=True)
+        return _adapter
+
+
+def getSession():
+    """
+    Returns this thread's session. Sessions keep their own cookies but all of them
+    share the same connection pools, which are safe to use from several threads.
+
+    """
+    session = getattr(_local, 'session', None)
+    if session is None:
+        session = requests.Session()
+        adapter = _getAdapter()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        _local.session = session
+    return session
+
+
+def configure(hosts=POOL_HOSTS, per_host=POOL_MAXSIZE, timeout=TIMEOUT):
+    """
+    Sets the pool limits and timeout. Call before the first request.
+
+    """
+    global POOL_HOSTS, POOL_MAXSIZE, TIMEOUT
+    POOL_HOSTS, POOL_MAXSIZE, TIMEOUT = hosts, per_host, timeout
+
+
+def get(url):
+    """
+    Fetches url over a pooled keep-alive connection and returns its body.
+
+    ...
+
+    Parameters
+    ----------
+    url : str
+
+    Returns
+    -------
+    body : bytes
+
+    Raises
+    ------
+    HttpStatusError
+        if the page is answered with a 4xx or 5xx status.
+
+    """
+    response = getSession().get(url, timeout=TIMEOUT)
+    if response.status_code >= 400:
+        raise HttpStatusError(url, response.status_code)
+    return response.content
@@ -0,0 +1,164 @@
+"""
+Defers importing heavy dependencies (spacy, nltk, enchant, selenium, wikipedia, PIL...)
+until the first code path that actually needs them, and keeps track of how long
+each one took to load so that startup cost can be reported.
+"""
+
+import importlib
+import threading
+import time
+
+try:
+    import resource
+except ImportError:                                   # Not available on Windows
+    resource = None
+
+_lock = threading.RLock()
+_registry = {}      # name -> LazyImport / LazyResource, in registration order
+_timings = {}       # name -> (seconds, peak RSS growth in KiB or None)
+
+
+def _peakRss():
+    """
+    Returns the peak resident set size of the process in KiB, or None if unknown.
+
+    """
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _timed(name, loader):
+    """
+    Calls loader() and records the time and memory it took under name.
+
+    """
+    rss_before = _peakRss()
+    start = time.perf_counter()
+    value = loader()
+    elapsed = time.perf_counter() - start
+    rss_after = _peakRss()
+    growth = rss_after - rss_before if rss_before is not None else None
+    _timings.setdefault(name, (elapsed, growth))
+    return value
+
+
+class LazyImport:
+    """
+    Stand-in for a module (or an attribute of a module) that is imported on first use.
+    Attribute access and calls are forwarded to the real object once it is loaded.
+
+    """
+
+    def __init__(self, module, attr=None):
+        self._module_name = module
+        self._attr = attr
+        self._target = None
+
+    @property
+    def name(self):
+        return self._module_name if self._attr is None else f'{self._module_name}.{self._attr}'
+
+    @property
+    def loaded(self):
+        return self._target is not None
+
+    def load(self):
+        if self._target is None:
+            with _lock:
+                if self._target is None:
+                    module = _timed(self._module_name, lambda: importlib.import_module(self._module_name))
+                    self._target = module if self._attr is None else getattr(module, self._attr)
+        return self._target
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+    def __call__(self, *args, **kwargs):
+        return self.load()(*args, **kwargs)
+
+    def __repr__(self):
+        state = 'loaded' if self.loaded else 'not loaded'
+        return f'<LazyImport {self.name} ({state})>'
+
+
+class LazyResource:
+    """
+    Expensive object (e.g. a spacy model) that is built by loader() the first time get() is called.
+
+    """
+
+    def __init__(self, name, loader):
+        self.name = name
+        self._loader = loader
+        self._value = None
+        self.loaded = False
+
+    def get(self):
+        if not self.loaded:
+            with _lock:
+                if not self.loaded:
+                    self._value = _timed(self.name, self._loader)
+                    self.loaded = True
+        return self._value
+
+
+def lazyImport(module, attr=None):
+    """
+    Returns a lazy stand-in for `import module` or `from module import attr`.
+    Stand-ins are shared, so every file asking for the same name gets the same object.
+
+    ...
+
+    Parameters
+    ----------
+    module : str
+        dotted module name, e.g. 'selenium.webdriver'
+    attr : str, optional
+        name to take from the module, e.g. 'BeautifulSoup'. The default is None.
+
+    Returns
+    -------
+    LazyImport
+
+    """
+    key = module if attr is None else f'{module}.{attr}'
+    with _lock:
+        if key not in _registry:
+            _registry[key] = LazyImport(module, attr)
+        return _registry[key]
+
+
+def lazyResource(name, loader):
+    """
+    Returns a LazyResource that builds its value with loader() on the first get().
+
+    """
+    with _lock:
+        if name not in _registry:
+            _registry[name] = LazyResource(name, loader)
+        return _registry[name]
+
+
+def startupReport():
+    """
+    Returns a printable report of every registered dependency with the time and
+    peak memory growth its first load cost, or whether it was never needed.
+
+    Times are inclusive: a resource that imports its library will include that import.
+
+    """
+    lines = ['Startup profile (dependency, load time, peak RSS growth)']
+    seen = set()
+    for name, dep in _registry.items():
+        module_name = getattr(dep, '_module_name', name)
+        if module_name in seen:
+            continue
+        seen.add(module_name)
+        if module_name in _timings:
+            elapsed, growth = _timings[module_name]
+            memory = f'{growth / 1024:.1f} MiB' if growth is not None else 'n/a'
+            lines.append(f'\t{module_name:<40} {elapsed * 1000:9.1f} ms  {memory:>10}')
+        else:
+            lines.append(f'\t{module_name:<40} {"not loaded":>12}')
+    return '\n'.join(lines)
@@ -0,0 +1,184 @@
+"""
+Lexicon service shared by every module: English stopwords as a frozenset and a memoized
+dictionary check. Everything is loaded once per process instead of being rebuilt (the
+stopword list) or reopened (the enchant dictionary) on every call.
+
+Dictionary checks are answered by the compiled LexiconIndex when there is one, and by
+enchant otherwise.
+"""
+
+import itertools
+import threading
+from modules import LexiconIndex
+from modules.LazyLoader import lazyImport
+
+nltk_stopwords = lazyImport('nltk.corpus', 'stopwords')
+enchant = lazyImport('enchant')
+
+# Words that are not stopwords in English, but are never answers when they turn up in page text
+CANDIDATE_STOPWORDS = ('list', 'com', 'www')
+DICTIONARY = 'en_US'
+USE_INDEX = True        # Set to False to check words with enchant even when there is an index
+FALLBACK_BLANKS = 2     # Most blanks matches() fills by trying every letter when there is no index
+
+_lock = threading.Lock()
+_stopwords = None
+_candidate_stopwords = None
+_dictionary = None
+_checked = {}       # word -> whether it is in the dictionary
+
+
+def load():
+    """
+    Loads the stopwords and the dictionary now. Call before using the lexicon from several
+    threads, the corpus readers underneath are not safe to load concurrently.
+
+    """
+    _loadStopwords()
+    if index() is None:
+        _loadDictionary()
+
+
+def index():
+    """
+    Returns the compiled LexiconIndex, or None if it is disabled or unavailable.
+
+    """
+    return LexiconIndex.getIndex() if USE_INDEX else None
+
+
+def _loadStopwords():
+    global _stopwords, _candidate_stopwords
+    with _lock:
+        if _stopwords is None:
+            _stopwords = frozenset(word.lower() for word in nltk_stopwords.words('english'))
+            _candidate_stopwords = _stopwords.union(CANDIDATE_STOPWORDS)
+
+
+def _loadDictionary():
+    global _dictionary
+    with _lock:
+        if _dictionary is None:
+            _dictionary = enchant.Dict(DICTIONARY)
+
+
+def stopwords():
+    """
+    Returns the English stopwords, lowercase.
+
+    """
+    if _stopwords is None:
+        _loadStopwords()
+    return _stopwords
+
+
+def candidateStopwords():
+    """
+    Returns the English stopwords plus CANDIDATE_STOPWORDS, lowercase.
+
+    """
+    if _candidate_stopwords is None:
+        _loadStopwords()
+    return _candidate_stopwords
+
+
+def check(word):
+    """
+    Returns whether word is in the dictionary. Results are memoized.
+
+    """
+    known = _checked.get(word)
+    if known is None and index() is not None:
+        known = index().isWord(word)
+        _checked[word] = known
+    if known is None:
+        if _dictionary is None:
+            _loadDictionary()
+        with _lock:                 # enchant dictionaries are not safe to share between threads
+            known = _dictionary.check(word)
+        _checked[word] = known
+    return known
+
+
+def checkMany(words):
+    """
+    Checks many words at once.
+
+    ...
+
+    Parameters
+    ----------
+    words : iterable
+        words to check
+
+    Returns
+    -------
+    valid : set
+        the words that are in the dictionary
+
+    """
+    if index() is not None:
+        return index().containsMany(words)
+    return {word for word in words if check(word)}
+
+
+def lettersAt(pattern, position, blank='*'):
+    """
+    Returns the letters that can go at position in the dictionary words fitting pattern,
+    see matches.
+
+    """
+    if index() is not None:
+        return index().lettersAt(pattern.upper().replace(blank, '?'), position)
+    return {word[position] for word in matches(pattern, blank)}
+
+
+def countMatches(pattern, blank='*'):
+    """
+    Returns how many dictionary words fit pattern, see matches.
+
+    """
+    if index() is not None:
+        return index().countMatches(pattern.upper().replace(blank, '?'))
+    return len(matches(pattern, blank))
+
+
+def matches(pattern, blank='*', limit=None):
+    """
+    Returns the dictionary words fitting pattern, where blank stands for any letter.
+    Without the index every letter is tried in every blank, so patterns with more
+    than FALLBACK_BLANKS blanks give nothing then.
+
+    ...
+
+    Parameters
+    ----------
+    pattern : str
+        e.g. 'C*T**'
+    blank : str, optional
+        character marking the unknown letters. The default is '*'.
+    limit : int, optional
+        most words returned. The default is None.
+
+    Returns
+    -------
+    words : set
+        matching words, uppercase
+
+    """
+    pattern = pattern.upper()
+    if index() is not None:
+        return set(index().match(pattern.replace(blank, '?'), limit))
+
+    blanks = pattern.count(blank)
+    if blanks > FALLBACK_BLANKS:
+        return set()
+    words = set()
+    template = pattern.replace('%', '%%').replace(blank, '%s')
+    for letters in itertools.product(LexiconIndex.ALPHABET, repeat=blanks):
+        word = template % letters
+        if check(word):
+            words.add(word)
+            if limit is not None and len(words) >= limit:
+                break
+    return words
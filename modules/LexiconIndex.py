@@ -0,0 +1,327 @@
+"""
+Compiled on-disk word list, memory-mapped at load. Words are grouped by length and stored
+as sorted fixed-width records, so membership is a binary search. For every length,
+(position, letter) pair there is a bitset of the words with that letter at that position,
+so a pattern such as C?T?? is answered by ANDing a few bitsets.
+
+Build it once with:
+    python -m modules.LexiconIndex [--words FILE ...]
+Otherwise getIndex builds it the first time it is needed, which takes a while and is
+logged as it happens.
+"""
+
+import argparse
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+from modules import Metrics
+from modules import Settings
+from modules.LazyLoader import lazyImport
+
+nltk_words = lazyImport('nltk.corpus', 'words')
+enchant = lazyImport('enchant')
+
+MAGIC = b'CWLX'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sII')        # magic, format version, number of length groups
+GROUP = struct.Struct('<IIQQ')         # word length, word count, words offset, postings offset
+ALPHABET = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+WILDCARDS = '?*_.'
+MAX_LENGTH = 25
+
+INDEX_PATH = os.environ.get('CROSSWALKER_LEXICON', os.path.join(Settings.DATA_DIR, 'lexicon.idx'))
+
+# Endings tried on every base word when building, kept only if the dictionary accepts them
+INFLECTIONS = ('S', 'ES', 'ED', 'D', 'ING', 'ER', 'LY')
+
+
+class LexiconIndex:
+    """
+    Read-only view of a compiled index file.
+
+    ...
+
+    Parameters
+    ----------
+    path : str
+        path of a file written by build()
+
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, num_groups = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f'{path} is not a lexicon index of version {FORMAT_VERSION}')
+        self._groups = {}       # length -> (count, words offset, postings offset)
+        for i in range(num_groups):
+            length, count, words_offset, postings_offset = GROUP.unpack_from(
+                self._mm, HEADER.size + i * GROUP.size)
+            self._groups[length] = (count, words_offset, postings_offset)
+        self._bitsets = {}      # (length, position, letter) -> int, decoded on first use
+
+    def __len__(self):
+        return sum(count for count, _, _ in self._groups.values())
+
+    def lengths(self):
+        return sorted(self._groups)
+
+    def _word(self, length, i):
+        offset = self._groups[length][1] + i * length
+        return self._mm[offset:offset + length].decode('ascii')
+
+    def _bitset(self, length, position, letter):
+        key = (length, position, letter)
+        bits = self._bitsets.get(key)
+        if bits is None:
+            count, _, postings_offset = self._groups[length]
+            size = (count + 7) // 8
+            offset = postings_offset + (position * len(ALPHABET) + ALPHABET.index(letter)) * size
+            bits = int.from_bytes(self._mm[offset:offset + size], 'little')
+            self._bitsets[key] = bits
+        return bits
+
+    def isWord(self, word):
+        """
+        Returns whether word (any case) is in the index.
+
+        """
+        word = word.upper()
+        length = len(word)
+        if length not in self._groups:
+            return False
+        count, words_offset, _ = self._groups[length]
+        target = word.encode('ascii', 'replace')
+        lo, hi = 0, count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            offset = words_offset + mid * length
+            record = self._mm[offset:offset + length]
+            if record < target:
+                lo = mid + 1
+            elif record > target:
+                hi = mid
+            else:
+                return True
+        return False
+
+    def containsMany(self, words):
+        """
+        Returns the subset of words that are in the index.
+
+        """
+        return {word for word in words if self.isWord(word)}
+
+    def _matchBits(self, pattern):
+        pattern = pattern.upper()
+        length = len(pattern)
+        if length not in self._groups:
+            return length, 0
+        bits = (1 << self._groups[length][0]) - 1
+        for position, letter in enumerate(pattern):
+            if letter in WILDCARDS:
+                continue
+            if letter not in ALPHABET:
+                return length, 0
+            bits &= self._bitset(length, position, letter)
+            if not bits:
+                break
+        return length, bits
+
+    def match(self, pattern, limit=None):
+        """
+        Returns the words that fit a pattern where ?, *, _ or . stand for any letter.
+
+        ...
+
+        Parameters
+        ----------
+        pattern : str
+            e.g. 'C?T??'
+        limit : int, optional
+            stop after this many words. The default is None.
+
+        Returns
+        -------
+        words : list
+            matching words, uppercase and in alphabetical order
+
+        """
+        length, bits = self._matchBits(pattern)
+        words = []
+        if not bits:
+            return words
+        raw = bits.to_bytes((self._groups[length][0] + 7) // 8, 'little')
+        for byte_index, byte in enumerate(raw):
+            if not byte:
+                continue
+            for bit in range(8):
+                if byte >> bit & 1:
+                    words.append(self._word(length, byte_index * 8 + bit))
+                    if limit is not None and len(words) >= limit:
+                        return words
+        return words
+
+    def countMatches(self, pattern):
+        """
+        Returns how many words fit a pattern, without building them.
+
+        """
+        return bin(self._matchBits(pattern)[1]).count('1')
+
+    def lettersAt(self, pattern, position):
+        """
+        Returns the letters that can go at position in words fitting pattern.
+
+        """
+        length, bits = self._matchBits(pattern)
+        if not bits:
+            return set()
+        return {letter for letter in ALPHABET if bits & self._bitset(length, position, letter)}
+
+    def close(self):
+        self._mm.close()
+
+
+def normalize(words):
+    """
+    Returns the uppercase, purely alphabetic words of an iterable, without duplicates.
+
+    """
+    regex = re.compile('^[A-Z]+$')
+    return {word.upper() for word in words
+            if 0 < len(word) <= MAX_LENGTH and regex.match(word.upper())}
+
+
+def build(words, path=INDEX_PATH):
+    """
+    Compiles words into an index file at path.
+
+    ...
+
+    Parameters
+    ----------
+    words : iterable
+        words to index, see normalize()
+    path : str, optional
+        file to write. The default is INDEX_PATH.
+
+    Returns
+    -------
+    count : int
+        number of words indexed
+
+    """
+    groups = {}
+    for word in normalize(words):
+        groups.setdefault(len(word), []).append(word)
+    for group in groups.values():
+        group.sort()
+
+    lengths = sorted(groups)
+    offset = HEADER.size + len(lengths) * GROUP.size
+    table = []
+    sections = []
+    for length in lengths:
+        group = groups[length]
+        count = len(group)
+        records = ''.join(group).encode('ascii')
+
+        size = (count + 7) // 8
+        postings = []
+        for position in range(length):
+            columns = {letter: bytearray(size) for letter in ALPHABET}
+            for i, word in enumerate(group):
+                columns[word[position]][i >> 3] |= 1 << (i & 7)
+            postings.extend(bytes(columns[letter]) for letter in ALPHABET)
+        postings = b''.join(postings)
+
+        table.append(GROUP.pack(length, count, offset, offset + len(records)))
+        sections.extend([records, postings])
+        offset += len(records) + len(postings)
+
+    # Named after the process, so that processes building at once don't write into each other's file
+    tmp = f'{path}.{os.getpid()}.tmp'
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(tmp, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(lengths)))
+        f.writelines(table)
+        f.writelines(sections)
+    os.replace(tmp, path)
+    return sum(len(group) for group in groups.values())
+
+
+def defaultWords(extra_files=()):
+    """
+    Returns the words the default index is built from: the nltk words corpus and
+    /usr/share/dict/words if there is one, plus the inflections of those words that the
+    enchant dictionary accepts, plus the words in extra_files (one word per line).
+
+    """
+    words = set(normalize(nltk_words.words()))
+    files = list(extra_files)
+    if os.path.exists('/usr/share/dict/words'):
+        files.append('/usr/share/dict/words')
+    for file in files:
+        with open(file, encoding='utf-8', errors='ignore') as f:
+            words.update(normalize(line.strip() for line in f))
+
+    dictionary = enchant.Dict('en_US')
+    inflected = set()
+    for word in words:
+        for ending in INFLECTIONS:
+            candidate = word + ending
+            if len(candidate) <= MAX_LENGTH and candidate not in words and dictionary.check(candidate):
+                inflected.add(candidate)
+    return words.union(inflected)
+
+
+_index = None
+_index_loaded = False
+_index_lock = threading.Lock()
+
+
+def getIndex(build_missing=True):
+    """
+    Returns the shared index at INDEX_PATH, building it from defaultWords() the first time
+    if build_missing is set. Returns None if there is no index and it can't be built,
+    callers then fall back to the enchant dictionary.
+
+    """
+    global _index, _index_loaded
+    with _index_lock:
+        if not _index_loaded:
+            _index_loaded = True
+            try:
+                if not os.path.exists(INDEX_PATH) and build_missing:
+                    print(f'No lexicon index at {INDEX_PATH}, building it now '
+                          f'(python -m modules.LexiconIndex builds it ahead of time)')
+                    start = time.perf_counter()
+                    with Metrics.span('lexicon_build'):
+                        count = build(defaultWords(), INDEX_PATH)
+                    print(f'Indexed {count} words in {time.perf_counter() - start:.1f} seconds')
+                if os.path.exists(INDEX_PATH):
+                    _index = LexiconIndex(INDEX_PATH)
+            except Exception as e:
+                print(f'Lexicon index unavailable: {e!r}')
+                _index = None
+        return _index
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compile the lexicon index.')
+    parser.add_argument('--words', nargs='*', default=[],
+                        help='extra word list files, one word per line')
+    parser.add_argument('--output', default=INDEX_PATH, help='index file to write')
+    args = parser.parse_args()
+    count = build(defaultWords(args.words), args.output)
+    print(f'Indexed {count} words in {args.output}')
+
+
+if __name__ == '__main__':
+    main()
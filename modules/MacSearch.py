@@ -0,0 +1,178 @@
+"""
+Backtracking search that maintains arc consistency (MAC). After every assignment the
+domains of the unassigned clues are pruned by propagating from the assigned clue, every
+removal is recorded on a trail and undone when the search backs up. The next clue is the
+one with the smallest remaining domain, ties broken by the number of unassigned crossings.
+"""
+
+from collections import defaultdict
+from modules.ArcConsistency import ArcConsistency
+
+
+class MacSearch:
+    """
+    MAC search over the clues with non-empty domains.
+
+    ...
+
+    Parameters
+    ----------
+    domains : dict
+        clue id -> set of candidate words. Clues with empty domains are left out.
+    arcs : list
+        ((x, y), (i, j)) constraints, see ArcConsistency
+    max_solutions : int, optional
+        stop after this many complete solutions. The default is 1.
+    on_solution : function, optional
+        called by run() as on_solution(items, complete) with a list of (clue id, answer)
+        pairs for every complete solution and every dead end
+    value : function, optional
+        value(clue id, word) of placing a word, words are tried most valuable first.
+        The default is None, which tries them in any order.
+
+    """
+
+    def __init__(self, domains, arcs, max_solutions=1, on_solution=None, value=None):
+        self.domains = {var: domain for var, domain in domains.items() if domain}
+        self.variables = list(self.domains)
+        arcs = [arc for arc in arcs if arc[0][0] in self.domains and arc[0][1] in self.domains]
+        self.engine = ArcConsistency(arcs)
+
+        # Each clue's own crossings, (my index, other clue, other index)
+        self.neighbors = defaultdict(list)
+        for (x, y), (i, j) in arcs:
+            self.neighbors[x].append((i, y, j))
+
+        self.max_solutions = max_solutions
+        self.value = value
+        self.on_solution = on_solution
+        self.solutions = []
+        self.trail = []
+        self.nodes = 0
+
+    def undo(self, mark):
+        """
+        Restores every domain changed since the trail was mark entries long.
+
+        """
+        trail, domains = self.trail, self.domains
+        while len(trail) > mark:
+            var, domain = trail.pop()
+            domains[var] = domain
+
+    def select(self, assignment):
+        """
+        Returns the unassigned clue with the smallest domain, preferring the one
+        crossing the most unassigned clues on ties.
+
+        """
+        best, best_key = None, None
+        for var in self.variables:
+            if var in assignment:
+                continue
+            degree = sum(1 for _, other, _ in self.neighbors[var] if other not in assignment)
+            key = (len(self.domains[var]), -degree)
+            if best_key is None or key < best_key:
+                best, best_key = var, key
+        return best
+
+    def orderValues(self, var, assignment):
+        """
+        Returns the words to try for var, most valuable first if there is a value.
+
+        """
+        if self.value is None:
+            return self.domains[var]
+        value = self.value
+        return sorted(self.domains[var], key=lambda word: (-value(var, word), word))
+
+    def isConsistent(self, var, word, assignment):
+        """
+        Checks word only against the assigned clues crossing var.
+
+        """
+        for i, other, j in self.neighbors[var]:
+            answer = assignment.get(other)
+            if answer is not None and word[i] != answer[j]:
+                return False
+        return True
+
+    def _done(self):
+        return len(self.solutions) >= self.max_solutions
+
+    def leaves(self, assignment=None):
+        """
+        Generates the leaves of the search as they are reached, starting from assignment
+        if given. Domains are restored when the generator finishes or is closed early.
+
+        ...
+
+        Yields
+        ------
+        items : list
+            (clue id, answer) pairs of a complete solution or a dead end
+        complete : bool
+            whether every clue has an answer
+
+        """
+        assignment = dict(assignment or {})
+        mark = len(self.trail)
+        try:
+            if self.engine.propagate(self.domains, trail=self.trail, strict=True):
+                yield from self._search(assignment)
+            else:
+                yield list(assignment.items()), False
+        finally:
+            self.undo(mark)
+
+    def run(self, assignment=None):
+        """
+        Searches for complete solutions, starting from assignment if given, and reports
+        every leaf to on_solution.
+
+        ...
+
+        Returns
+        -------
+        solutions : list
+            complete solutions as lists of (clue id, answer) pairs
+
+        """
+        for items, complete in self.leaves(assignment):
+            if self.on_solution:
+                self.on_solution(items, complete)
+        return self.solutions
+
+    def _search(self, assignment):
+        self.nodes += 1
+        if len(assignment) == len(self.variables):
+            items = list(assignment.items())
+            self.solutions.append(items)
+            yield items, True
+            return
+
+        var = self.select(assignment)
+        extended = False
+        for word in list(self.orderValues(var, assignment)):
+            if not self.isConsistent(var, word, assignment):
+                continue
+
+            mark = len(self.trail)
+            assignment[var] = word
+            self.trail.append((var, self.domains[var]))
+            self.domains[var] = {word}
+
+            # Prune the clues crossing var, and whatever that pruning affects in turn
+            if self.engine.propagate(self.domains, queue=self.engine.incoming[var],
+                                     trail=self.trail, strict=True):
+                extended = True
+                yield from self._search(assignment)
+
+            del assignment[var]
+            self.undo(mark)
+            if self._done():
+                return
+
+        # Nothing fits here, report what we have as a partial solution
+        if not extended:
+            yield list(assignment.items()), False
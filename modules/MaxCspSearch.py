@@ -0,0 +1,305 @@
+"""
+Branch-and-bound search for the most answers that can be placed together (a max-CSP).
+Every clue either gets one of its candidates or is left blank, crossing answers must
+agree. One search covers what the leave-one-out loop in CROSSWALKER.solve tried to
+approximate by restarting with each clue dropped in turn, and the best solution found so
+far bounds every later part of the search.
+
+Assigning a word prunes the domains of the crossing clues (forward checking) through
+per-position letter indexes; full arc consistency would be unsound here since a
+crossing clue may still end up blank. Words are tried in the order of how well the
+candidates of the crossing clues back them, and a clue is tried blank before words that
+disagree with most of the best backed crossing words, so the first solutions found are
+good ones and the bound prunes early. When words have values of their own, e.g. how many
+sources found them, those values are where the backing starts from.
+"""
+
+import time
+from collections import defaultdict
+
+SUPPORT_ROUNDS = 8      # Rounds of support scoring used to order the words tried
+BLANK_SUPPORT = 0.1     # Support a word gets from a crossing as if the crossing clue were blank
+BLANK_FIRST = 0.5       # Leaving a clue blank is tried before words agreeing with the best
+                        # backed words of fewer than this share of their crossings
+
+
+def letterValue(var, word):
+    """
+    Default value of placing word: its number of letters.
+
+    """
+    return len(word)
+
+
+class ValueTable:
+    """
+    Value of placing a word looked up in a table of scores, e.g. the candidate scores of
+    every clue. Unlike a lambda it can be sent to other processes.
+
+    ...
+
+    Parameters
+    ----------
+    scores : dict
+        clue id -> word -> value
+    default : float, optional
+        value of words missing from the table. The default is 0.
+
+    """
+
+    def __init__(self, scores, default=0.0):
+        self.scores = scores
+        self.default = default
+
+    def __call__(self, var, word):
+        return self.scores.get(var, {}).get(word, self.default)
+
+
+class MaxCspSearch:
+    """
+    Branch-and-bound over the clues with non-empty domains. Solutions are compared by
+    (number of answers placed, total value of the answers placed).
+
+    ...
+
+    Parameters
+    ----------
+    domains : dict
+        clue id -> set of candidate words. Clues with empty domains are left out.
+    arcs : list
+        ((x, y), (i, j)) constraints, see ArcConsistency
+    value : function, optional
+        value(clue id, word) of placing a word, used to break ties between solutions
+        placing as many answers and to order the words tried. The default is letterValue.
+    max_nodes : int, optional
+        stop after visiting this many nodes. The default is None.
+    deadline : float, optional
+        time.monotonic() value to stop at. The default is None.
+    bound : tuple, optional
+        score a solution has to beat to be reported, e.g. the best score of an earlier
+        run. The default is None.
+
+    """
+
+    def __init__(self, domains, arcs, value=letterValue, max_nodes=None, deadline=None, bound=None):
+        self.domains = {var: set(domain) for var, domain in domains.items() if domain}
+        self.variables = list(self.domains)
+        self.value = value
+        self.max_nodes = max_nodes
+        self.deadline = deadline
+
+        self.neighbors = defaultdict(list)      # var -> (my index, other clue, other index)
+        for (x, y), (i, j) in arcs:
+            if x in self.domains and y in self.domains:
+                self.neighbors[x].append((i, y, j))
+
+        # postings[var][j][letter] = words of var's domain with letter at position j
+        self.postings = {}
+        for var, domain in self.domains.items():
+            positions = defaultdict(lambda: defaultdict(set))
+            for word in domain:
+                for j, letter in enumerate(word):
+                    positions[j][letter].add(word)
+            self.postings[var] = positions
+
+        self.values = {var: {word: value(var, word) for word in domain}
+                       for var, domain in self.domains.items()}
+        self.max_value = {var: max(values.values()) for var, values in self.values.items()}
+
+        self.support = self.supportScores()
+
+        # agreement[var][word] = share of var's crossings where word agrees with the best
+        # backed word of the crossing clue. A clue whose words all disagree with their
+        # crossings most likely lacks its answer and is better tried blank first
+        top = {var: max(words, key=words.get) for var, words in self.support.items()}
+        self.agreement = {}
+        for var, domain in self.domains.items():
+            neighbors = self.neighbors[var]
+            self.agreement[var] = {
+                word: (sum(1 for i, other, j in neighbors if word[i] == top[other][j]) / len(neighbors)
+                       if neighbors else 1.0)
+                for word in domain}
+
+        self.trail = []
+        self.blank = set()
+        self.best = None
+        self.best_score = bound
+        self.nodes = 0
+        self._stopped = False
+        self.exhausted = False      # True once the whole tree was searched, ie best is optimal
+
+    def supportScores(self, rounds=SUPPORT_ROUNDS):
+        """
+        Estimates how likely every word is to be the answer from its value and how well
+        the candidates of its crossing clues back it. Scores start out as the words' shares
+        of their clue's total value, and each round a word's score becomes its share times
+        the product over its crossings of the best score among the crossing clue's words
+        agreeing with it, plus BLANK_SUPPORT for the chance that the crossing clue stays
+        blank, normalized over the clue's words. Words of a fill that agrees everywhere
+        gather the scores while the others fade away. Taking the best agreeing word rather
+        than adding them all up keeps words made of common letters from winning just
+        because many candidates share those letters.
+
+        ...
+
+        Returns
+        -------
+        support : dict
+            var -> word -> score, the scores of a clue's words add up to 1
+
+        """
+        # Words of equal value, e.g. the letter counts of one clue, start out even
+        prior = {}
+        for var, values in self.values.items():
+            total = sum(values.values())
+            prior[var] = ({word: value / total for word, value in values.items()} if total > 0
+                          else dict.fromkeys(values, 1 / len(values)))
+        scores = prior
+        for _ in range(rounds):
+            # best[var][j][letter] = best score of var's words with letter at position j
+            best = {}
+            for var, words in scores.items():
+                positions = defaultdict(dict)
+                for word, score in words.items():
+                    for j, letter in enumerate(word):
+                        if score > positions[j].get(letter, 0.0):
+                            positions[j][letter] = score
+                best[var] = positions
+
+            updated = {}
+            for var, words in scores.items():
+                neighbors = self.neighbors[var]
+                raw = {}
+                for word in words:
+                    product = prior[var][word]
+                    for i, other, j in neighbors:
+                        product *= BLANK_SUPPORT + best[other][j].get(word[i], 0.0)
+                    raw[word] = product
+                total = sum(raw.values())
+                updated[var] = ({word: score / total for word, score in raw.items()} if total > 0
+                                else prior[var])
+            scores = updated
+        return scores
+
+    def undo(self, mark):
+        """
+        Restores every domain changed since the trail was mark entries long.
+
+        """
+        trail, domains = self.trail, self.domains
+        while len(trail) > mark:
+            var, domain = trail.pop()
+            domains[var] = domain
+
+    def select(self, open_vars, assignment):
+        """
+        Returns the open clue with the smallest domain, preferring the one crossing
+        the most unassigned clues on ties.
+
+        """
+        return min(open_vars, key=lambda var: (
+            len(self.domains[var]),
+            -sum(1 for _, other, _ in self.neighbors[var] if other not in assignment)))
+
+    def orderValues(self, var):
+        """
+        Returns the words to try for var, best backed first, see supportScores, then the
+        most valuable ones, then alphabetically.
+
+        """
+        values, support = self.values[var], self.support[var]
+        return sorted(self.domains[var], key=lambda word: (-support[word], -values[word], word))
+
+    def _outOfBudget(self):
+        if self.max_nodes is not None and self.nodes >= self.max_nodes:
+            return True
+        return self.deadline is not None and self.nodes % 256 == 0 and time.monotonic() >= self.deadline
+
+    def improvements(self):
+        """
+        Runs the search and generates each solution that is better than all the ones before.
+        The last one generated is the best solution found.
+
+        ...
+
+        Yields
+        ------
+        items : list
+            (clue id, answer) pairs
+
+        """
+        self._stopped = False
+        yield from self._search({}, 0)
+        self.exhausted = not self._stopped
+
+    def run(self):
+        """
+        Runs the search to the end and returns the best solution found.
+
+        """
+        for _ in self.improvements():
+            pass
+        return self.best
+
+    def _search(self, assignment, placed_value):
+        if self._stopped:
+            return
+        self.nodes += 1
+        if self._outOfBudget():
+            self._stopped = True
+            return
+
+        open_vars = [var for var in self.variables
+                     if var not in assignment and var not in self.blank and self.domains[var]]
+
+        # Even if every open clue got its most valuable word we could not beat the best
+        bound = (len(assignment) + len(open_vars),
+                 placed_value + sum(self.max_value[var] for var in open_vars))
+        if self.best_score is not None and bound <= self.best_score:
+            return
+
+        if not open_vars:
+            self.best_score = (len(assignment), placed_value)
+            self.best = list(assignment.items())
+            yield self.best
+            return
+
+        var = self.select(open_vars, assignment)
+
+        agreement = self.agreement[var]
+        blank_tried = False
+        for word in self.orderValues(var):
+            if not blank_tried and agreement[word] < BLANK_FIRST:
+                blank_tried = True
+                yield from self._blank(var, assignment, placed_value)
+                if self._stopped:
+                    return
+
+            mark = len(self.trail)
+            assignment[var] = word
+
+            # Crossing clues keep only the words agreeing with this one
+            for i, other, j in self.neighbors[var]:
+                if other in assignment or other in self.blank:
+                    continue
+                domain = self.domains[other]
+                pruned = domain.intersection(self.postings[other][j].get(word[i], ()))
+                if len(pruned) != len(domain):
+                    self.trail.append((other, domain))
+                    self.domains[other] = pruned
+
+            yield from self._search(assignment, placed_value + self.values[var][word])
+
+            del assignment[var]
+            self.undo(mark)
+            if self._stopped:
+                return
+
+        if not blank_tried:
+            yield from self._blank(var, assignment, placed_value)
+
+    def _blank(self, var, assignment, placed_value):
+        # Leave var blank
+        self.blank.add(var)
+        yield from self._search(assignment, placed_value)
+        self.blank.discard(var)
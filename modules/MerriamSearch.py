@@ -3,16 +3,27 @@ Finds candidates for a clue via Merriam-Webster.
 """
 
 import re
-import urllib.request
-from bs4 import BeautifulSoup
-from nltk.corpus import stopwords
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
+import threading
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+from modules import DriverPool
+from modules import HttpCache
+from modules import Lexicon
+from modules.LazyLoader import lazyImport
+
+BeautifulSoup = lazyImport('bs4', 'BeautifulSoup')
+
+# Dictionary + thesaurus candidates of single clue words, shared by all clues of the process.
+# Values are Futures so that a word asked for by several threads at once is still fetched once.
+_word_memo = {}
+_memo_lock = threading.Lock()
 
 
 def getCandidates(clue):
     """
-    Takes a clue and returns a set of candidates for that clue using Merriam-Webster.
+    Takes a clue and returns the candidates for that clue using Merriam-Webster, with the
+    number of lookups (the clue's dictionary and thesaurus pages, and those of each of its
+    words) each one turned up in.
     
     ...
 
@@ -22,26 +33,107 @@ def getCandidates(clue):
 
     Returns
     -------
-    candidates : set
-        set of candidates obtained via Merriam-Webster.
+    candidates : Counter
+        candidates obtained via Merriam-Webster -> number of lookups
 
     """
     if '___' in clue:
-        return {}
+        return Counter()
     print('\tGetting Merriam-Webster Candidates')
-    candidates = set()
+    candidates = Counter()
     formatted_clue = clue.replace(' ', '%20')                            # Clues are formatted to certain type
-    candidates = candidates.union(
+    candidates.update(
         getDictionaryCandidates(formatted_clue))                         # Candidates from dictionary called
-    candidates = candidates.union(
+    candidates.update(
         getThesaurusCandidates(formatted_clue))                          # Candidates from thesaurus called 
-    for word in removeNonAlphabetic(clue):
-        if word.lower() not in stopwords.words('english'):               # Candidate list are filtered from stopwords
-            candidates = candidates.union(getDictionaryCandidates(word)) # Thesaurus and dictionary candidates are added to the candidate list
-            candidates = candidates.union(getThesaurusCandidates(word))
+    for word in contentWords(clue):
+        candidates.update(lookupWord(word))                              # Thesaurus and dictionary candidates of each word are added to the candidates
     return candidates
 
 
+def contentWords(clue):
+    """
+    Returns the words of a clue that are looked up on their own, ie the non-stopwords.
+
+    """
+    stopwords = Lexicon.stopwords()
+    return {word.lower() for word in removeNonAlphabetic(clue)
+            if word and word.lower() not in stopwords}
+
+
+def lookupWord(word):
+    """
+    Returns the dictionary and thesaurus candidates of a single word. Each word is
+    fetched and parsed once per process, later calls are answered from the memo.
+
+    ...
+
+    Parameters
+    ----------
+    word : str
+
+    Returns
+    -------
+    candidates : set
+        set of candidates obtained via Merriam-Webster Dictionary and Thesaurus.
+
+    """
+    with _memo_lock:
+        future = _word_memo.get(word)
+        owner = future is None
+        if owner:
+            future = _word_memo[word] = Future()
+    if owner:
+        try:
+            future.set_result(getDictionaryCandidates(word).union(getThesaurusCandidates(word)))
+        except Exception as e:
+            future.set_exception(e)
+    return future.result()
+
+
+def prefetchWords(clues, max_workers=8):
+    """
+    Resolves the words of all clues of a puzzle up front. Words are de-duplicated
+    across clues and each unique word is looked up once, so the following
+    getCandidates calls only fetch the whole clue phrases.
+
+    ...
+
+    Parameters
+    ----------
+    clues : list
+        clue texts of the puzzle
+    max_workers : int, optional
+        number of words looked up at once. The default is 8.
+
+    Returns
+    -------
+    words : set
+        the unique words that were resolved
+
+    """
+    words = set()
+    for clue in clues:
+        if '___' not in clue:
+            words.update(contentWords(clue))
+    with _memo_lock:
+        missing = [word for word in words if word not in _word_memo]
+    if missing:
+        print(f'\tLooking up {len(missing)} unique Merriam-Webster words')
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(lookupWord, missing))
+    return words
+
+
+def clearMemo():
+    """
+    Forgets every memoized word lookup.
+
+    """
+    with _memo_lock:
+        _word_memo.clear()
+
+
 def getDictionaryCandidates(clue):
     """
     Takes a clue and returns a set of candidates for that clue using Merriam-Webster Dictionary.
@@ -61,8 +153,7 @@ def getDictionaryCandidates(clue):
     candidates = set()
     URL = f'https://www.merriam-webster.com/dictionary/{clue}'
     try:
-        webUrl = urllib.request.urlopen(URL)
-        data = webUrl.read()
+        data = HttpCache.fetch(URL, 'merriam')
         soup = BeautifulSoup(data, 'html.parser')
         definitions = soup.find_all('span', {'class': 'dtText'})
         for definition in definitions:
@@ -70,7 +161,9 @@ def getDictionaryCandidates(clue):
             words = re.split('[;:,.\-\% ]', text)  # Words from the text are separated according to the given separators and a list is created
             words.append(text.replace(" ", ""))    # Link text is added to the list, removing spaces
             candidates.update(words)               # The list is added to the candidate set
-    except:
+    except HttpCache.CacheMiss:
+        raise
+    except OSError:
         if '%20' in clue:      
             candidates.update(useSelenium(URL))    # If the clue consists of more than one word, useSelenium function is called
         else:
@@ -97,8 +190,7 @@ def getThesaurusCandidates(clue):
     candidates = set()
     URL = f'https://www.merriam-webster.com/thesaurus/{clue}'
     try:
-        webUrl = urllib.request.urlopen(URL)
-        data = webUrl.read()
+        data = HttpCache.fetch(URL, 'merriam')
         soup = BeautifulSoup(data, 'html.parser')
         lists = soup.find_all('ul', {'class': 'mw-list'})
         items = []
@@ -113,7 +205,9 @@ def getThesaurusCandidates(clue):
                     words = re.split('[;:,.\-\% ]', text) # Words from the text are separated according to the given separators and a list is created
                     words.append(text.replace(" ", ""))   # Link text is added to the list, removing spaces
                     candidates.update(words)              # The list is added to the candidate set
-    except:
+    except HttpCache.CacheMiss:
+        raise
+    except OSError:
         if '%20' in clue:
             candidates.update(useSelenium(URL))           # If the clue consists of more than one word, useSelenium function is called
         else:
@@ -124,15 +218,8 @@ def getThesaurusCandidates(clue):
 
 def useSelenium(URL):
     candidates = set()
-    options = Options()
-    options.add_argument('--ignore-certificate-errors')
-    options.add_argument('--ignore-ssl-errors')
-    options.add_argument('--headless')
-    options.add_argument('--log-level=3')
-    options.add_experimental_option('excludeSwitches', ['enable-logging'])
-    driver = webdriver.Chrome(options=options)
-    driver.get(URL)
-    soup = BeautifulSoup(driver.page_source, 'html.parser')
+    page_source = HttpCache.cached(f'selenium:{URL}', 'merriam', lambda: renderPage(URL))
+    soup = BeautifulSoup(page_source, 'html.parser')
     suggestions = soup.find_all('p', {'class': 'spelling-suggestions'})
     for sug in suggestions:
         text = sug.text
@@ -142,6 +229,16 @@ def useSelenium(URL):
     return candidates
 
 
+def renderPage(URL):
+    """
+    Renders a page in a headless driver borrowed from the shared pool and returns its HTML.
+
+    """
+    with DriverPool.borrow() as driver:
+        driver.get(URL)
+        return driver.page_source.encode('utf-8')
+
+
 def removeNonAlphabetic(clue):
     """
     Filters non-alphabetic words from the clue.
@@ -166,12 +263,18 @@ def isMeaningful(word):
     Returns
     -------
     bool
-        if there is no Merriam-Webster Dictionary page for the word, returns False.
+        if the word is not in the lexicon index and there is no Merriam-Webster
+        Dictionary page for it, returns False.
 
     """
+    index = Lexicon.index()
+    if index is not None and index.isWord(word):
+        return True
     URL = f'https://www.merriam-webster.com/dictionary/{word}'
     try:
-        webUrl = urllib.request.urlopen(URL)
-    except:
+        HttpCache.fetch(URL, 'merriam')
+    except HttpCache.CacheMiss:
+        raise
+    except OSError:
         return False
     return True
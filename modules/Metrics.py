@@ -0,0 +1,218 @@
+"""
+Timing spans and counters for the stages of a run, kept in memory and written out as
+JSON or as a Prometheus textfile (for node_exporter's textfile collector).
+
+Metrics are off unless CROSSWALKER_METRICS is set or enable() is called. Off, span()
+hands back one shared do-nothing context manager and count() returns at once, so hooks
+can stay in hot code. Hooks that would have to compute what they count test ENABLED
+first. Only the calling process is measured, worker processes keep their own metrics.
+"""
+
+import contextlib
+import functools
+import json
+import os
+import re
+import threading
+import time
+from collections import Counter
+
+ENABLED = bool(os.environ.get('CROSSWALKER_METRICS'))
+PREFIX = 'crosswalker'      # Prefix of the Prometheus metric names
+
+_NULL_SPAN = contextlib.nullcontext()
+_NAME = re.compile('[^a-zA-Z0-9_]')
+
+_lock = threading.Lock()
+_spans = dict()             # (name, labels) -> [calls, seconds, longest]
+_counters = Counter()       # (name, labels) -> value
+
+
+def enable(enabled=True):
+    """
+    Turns metrics on or off. What was recorded so far is kept, see reset.
+
+    """
+    global ENABLED
+    ENABLED = enabled
+
+
+def reset():
+    """
+    Forgets every span and counter recorded so far.
+
+    """
+    with _lock:
+        _spans.clear()
+        _counters.clear()
+
+
+def _labels(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+class _Span:
+    __slots__ = ('key', 'start')
+
+    def __init__(self, key):
+        self.key = key
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.start
+        with _lock:
+            span = _spans.get(self.key)
+            if span is None:
+                span = _spans[self.key] = [0, 0.0, 0.0]
+            span[0] += 1
+            span[1] += seconds
+            span[2] = max(span[2], seconds)
+        return False
+
+
+def span(name, **labels):
+    """
+    Returns a context manager timing the code it wraps, adding up the calls and
+    seconds of every span with the same name and labels.
+
+    ...
+
+    Parameters
+    ----------
+    name : str
+        what is timed, e.g. 'source'
+    **labels : str
+        what sets this span apart from others of the same name, e.g. source='WordNet'
+
+    """
+    if not ENABLED:
+        return _NULL_SPAN
+    return _Span((name, _labels(labels)))
+
+
+def timed(name, **labels):
+    """
+    Decorator timing every call of a function as a span.
+
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return fn(*args, **kwargs)
+            with _Span((name, _labels(labels))):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count(name, amount=1, **labels):
+    """
+    Adds amount to the counter with this name and labels.
+
+    """
+    if not ENABLED:
+        return
+    key = (name, _labels(labels))
+    with _lock:
+        _counters[key] += amount
+
+
+def snapshot():
+    """
+    Returns everything recorded so far.
+
+    ...
+
+    Returns
+    -------
+    metrics : dict
+        'spans': name, labels, calls, seconds and longest call of every span, and
+        'counters': name, labels and value of every counter
+
+    """
+    with _lock:
+        return {
+            'spans': [{'name': name, 'labels': dict(labels), 'calls': calls, 'seconds': round(seconds, 6),
+                       'max_seconds': round(longest, 6)}
+                      for (name, labels), (calls, seconds, longest) in sorted(_spans.items())],
+            'counters': [{'name': name, 'labels': dict(labels), 'value': value}
+                         for (name, labels), value in sorted(_counters.items())],
+        }
+
+
+def _metricName(*parts):
+    return _NAME.sub('_', '_'.join((PREFIX,) + parts))
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labelText(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{_NAME.sub("_", key)}="{_escape(value)}"' for key, value in labels) + '}'
+
+
+def prometheus():
+    """
+    Returns everything recorded so far in the Prometheus text format. Spans become
+    the span_calls_total, span_seconds_total and span_max_seconds families with a span
+    label, counters a NAME_total family each.
+
+    """
+    metrics = snapshot()
+    families = {
+        _metricName('span_calls_total'): ('counter', 'Calls of each span.', []),
+        _metricName('span_seconds_total'): ('counter', 'Seconds spent in each span.', []),
+        _metricName('span_max_seconds'): ('gauge', 'Longest call of each span.', []),
+    }
+    for span in metrics['spans']:
+        labels = _labels({'span': span['name'], **span['labels']})
+        families[_metricName('span_calls_total')][2].append((labels, span['calls']))
+        families[_metricName('span_seconds_total')][2].append((labels, span['seconds']))
+        families[_metricName('span_max_seconds')][2].append((labels, span['max_seconds']))
+    for counter in metrics['counters']:
+        name = _metricName(counter['name'], 'total')
+        families.setdefault(name, ('counter', f'Count of {counter["name"]}.', []))[2].append(
+            (_labels(counter['labels']), counter['value']))
+
+    lines = []
+    for name, (kind, help_text, samples) in families.items():
+        if not samples:
+            continue
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        lines.extend(f'{name}{_labelText(labels)} {value}' for labels, value in samples)
+    return '\n'.join(lines) + '\n'
+
+
+def _writeAtomic(path, text):
+    # Readers such as the textfile collector must never see half a file
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    temp = f'{path}.{os.getpid()}.tmp'
+    with open(temp, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(temp, path)
+
+
+def writeJson(path):
+    """
+    Writes everything recorded so far to path as JSON, see snapshot.
+
+    """
+    _writeAtomic(path, json.dumps(snapshot(), indent=2))
+
+
+def writePrometheus(path):
+    """
+    Writes everything recorded so far to path in the Prometheus text format, see
+    prometheus. Name the file *.prom for the textfile collector.
+
+    """
+    _writeAtomic(path, prometheus())
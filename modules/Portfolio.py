@@ -0,0 +1,302 @@
+"""
+Runs several solving strategies side by side on a process pool and keeps the best
+answer. Strategies differ in the engine (branch and bound, MAC, leave-one-out), the
+order clues and words are tried in, and whether the search restarts with a growing node
+limit. Which one finishes first depends a lot on the puzzle, so trying them all at once
+on otherwise idle cores gets the luckiest of them.
+
+The first strategy that places every clue with candidates, or that searched its whole
+tree, ends the run. Otherwise the best solution reported by the deadline is returned.
+"""
+
+import os
+import queue
+import random
+import time
+import multiprocessing
+from modules.ArcConsistency import ArcConsistency
+from modules.MacSearch import MacSearch
+from modules.MaxCspSearch import MaxCspSearch, letterValue
+from modules.SolutionSink import SolutionSink, ValueScore
+
+WORKERS = int(os.environ.get('CROSSWALKER_SOLVER_WORKERS', 0)) or None     # None: one per core
+DEADLINE = float(os.environ.get('CROSSWALKER_SOLVER_SECONDS', 60))
+GRACE = 5               # Seconds a strategy gets past the deadline to report what it has
+RESTART_NODES = 1000    # Node limit of a restart is this times the Luby sequence
+
+
+class Strategy:
+    """
+    One way of searching.
+
+    ...
+
+    Parameters
+    ----------
+    name : str
+        shown when the strategy reports
+    engine : str
+        'bnb', 'mac' or 'leave-one-out'
+    variables : str, optional
+        'mrv' for the smallest domain first, ties broken by crossings, 'random' for the
+        smallest domain first, ties broken at random, 'degree' for the most crossings
+        first. The default is 'mrv'.
+    values : str, optional
+        'value' for the most valuable word first, 'random' for a random order. The
+        default is 'value'.
+    restarts : bool, optional
+        restart the search with a growing node limit, carrying the best score over.
+        Only used by 'bnb'. The default is False.
+    seed : int, optional
+        seed of the random choices. The default is 0.
+
+    """
+
+    def __init__(self, name, engine, variables='mrv', values='value', restarts=False, seed=0):
+        self.name = name
+        self.engine = engine
+        self.variables = variables
+        self.values = values
+        self.restarts = restarts
+        self.seed = seed
+
+    def __repr__(self):
+        return f'Strategy({self.name!r})'
+
+
+def defaultStrategies():
+    return [
+        Strategy('bnb', 'bnb'),
+        Strategy('bnb-degree', 'bnb', variables='degree'),
+        Strategy('bnb-random-values', 'bnb', values='random', seed=1),
+        Strategy('bnb-restarts', 'bnb', variables='random', values='random', restarts=True, seed=2),
+        Strategy('bnb-restarts-2', 'bnb', variables='random', values='random', restarts=True, seed=3),
+        Strategy('mac', 'mac'),
+        Strategy('mac-random', 'mac', variables='random', values='random', seed=4),
+        Strategy('leave-one-out', 'leave-one-out'),
+    ]
+
+
+def luby(i):
+    """
+    Returns the i-th term (from 1) of the Luby sequence 1 1 2 1 1 2 4 1 1 2 ...
+
+    """
+    k = 1
+    while (1 << k) - 1 < i:
+        k += 1
+    if i == (1 << k) - 1:
+        return 1 << (k - 1)
+    return luby(i - (1 << (k - 1)) + 1)
+
+
+class _StrategyMaxCsp(MaxCspSearch):
+
+    def __init__(self, strategy, rng, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.strategy = strategy
+        self.rng = rng
+
+    def select(self, open_vars, assignment):
+        if self.strategy.variables == 'degree':
+            return min(open_vars, key=lambda var: (
+                -sum(1 for _, other, _ in self.neighbors[var] if other not in assignment),
+                len(self.domains[var])))
+        if self.strategy.variables == 'random':
+            return min(open_vars, key=lambda var: (len(self.domains[var]), self.rng.random()))
+        return super().select(open_vars, assignment)
+
+    def orderValues(self, var):
+        if self.strategy.values == 'random':
+            words = list(self.domains[var])
+            self.rng.shuffle(words)
+            return words
+        return super().orderValues(var)
+
+
+class _StrategyMac(MacSearch):
+
+    def __init__(self, strategy, rng, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.strategy = strategy
+        self.rng = rng
+
+    def select(self, assignment):
+        unassigned = [var for var in self.variables if var not in assignment]
+        if self.strategy.variables == 'degree':
+            return min(unassigned, key=lambda var: (
+                -sum(1 for _, other, _ in self.neighbors[var] if other not in assignment),
+                len(self.domains[var])))
+        if self.strategy.variables == 'random':
+            return min(unassigned, key=lambda var: (len(self.domains[var]), self.rng.random()))
+        return super().select(assignment)
+
+    def orderValues(self, var, assignment):
+        if self.strategy.values == 'random':
+            words = list(self.domains[var])
+            self.rng.shuffle(words)
+            return words
+        return super().orderValues(var, assignment)
+
+
+def _runBnb(strategy, rng, domains, arcs, value, deadline):
+    if not strategy.restarts:
+        search = _StrategyMaxCsp(strategy, rng, domains, arcs, value=value, deadline=deadline)
+        search.run()
+        return search.best, search.exhausted, search.nodes
+
+    best, bound, nodes, run = None, None, 0, 1
+    while time.monotonic() < deadline:
+        search = _StrategyMaxCsp(strategy, rng, domains, arcs, value=value, deadline=deadline,
+                                 max_nodes=luby(run) * RESTART_NODES, bound=bound)
+        search.run()
+        nodes += search.nodes
+        if search.best is not None:
+            best, bound = search.best, search.best_score
+        if search.exhausted:
+            return best, True, nodes
+        run += 1
+    return best, False, nodes
+
+
+def _runMac(strategy, rng, domains, arcs, value, deadline, sink):
+    search = _StrategyMac(strategy, rng, domains, arcs, value=value)
+    leaves = search.leaves()
+    try:
+        for items, complete in leaves:
+            sink.offer(items)
+            if complete or time.monotonic() >= deadline:
+                break
+    finally:
+        leaves.close()
+    return search.nodes
+
+
+def _runLeaveOneOut(strategy, rng, domains, arcs, value, deadline, sink):
+    nodes = 0
+    for bye in [None] + [var for var in domains if domains[var]]:
+        if time.monotonic() >= deadline:
+            break
+        trial = {var: (set() if var == bye else domain) for var, domain in domains.items()}
+        ArcConsistency(arcs).propagate(trial)
+        nodes += _runMac(strategy, rng, trial, arcs, value, deadline, sink)
+    return nodes
+
+
+def runStrategy(strategy, domains, arcs, stop_at, value=letterValue):
+    """
+    Runs one strategy until it is done or the time.time() value stop_at is reached.
+    This is what every worker process runs, value has to be picklable, e.g. a
+    MaxCspSearch.ValueTable.
+
+    ...
+
+    Returns
+    -------
+    result : dict
+        strategy: name of the strategy
+        items: best (clue id, answer) pairs found
+        score: ValueScore of items
+        complete: whether every clue with candidates got an answer
+        optimal: whether the whole search space was covered, so nothing better exists
+        nodes: search nodes visited
+        seconds: time taken
+
+    """
+    start = time.monotonic()
+    deadline = start + stop_at - time.time()
+    rng = random.Random(strategy.seed)
+    score = ValueScore(value)
+
+    if strategy.engine == 'bnb':
+        items, optimal, nodes = _runBnb(strategy, rng, domains, arcs, value, deadline)
+    else:
+        sink = SolutionSink(1, score=score)
+        if strategy.engine == 'mac':
+            nodes = _runMac(strategy, rng, domains, arcs, value, deadline, sink)
+        elif strategy.engine == 'leave-one-out':
+            nodes = _runLeaveOneOut(strategy, rng, domains, arcs, value, deadline, sink)
+        else:
+            raise ValueError(f'Unknown engine {strategy.engine!r}')
+        items, optimal = sink.best(), False
+
+    items = items or []
+    return {
+        'strategy': strategy.name,
+        'items': items,
+        'score': score(items),
+        'complete': len(items) == sum(1 for domain in domains.values() if domain),
+        'optimal': optimal,
+        'nodes': nodes,
+        'seconds': time.monotonic() - start,
+    }
+
+
+def solve(domains, arcs, strategies=None, workers=WORKERS, deadline=DEADLINE, on_result=None,
+          value=letterValue):
+    """
+    Runs the strategies on a process pool and returns the result of the first one that
+    is complete or optimal, or else the best result reported within the deadline.
+
+    ...
+
+    Parameters
+    ----------
+    domains : dict
+        clue id -> set of candidate words
+    arcs : list
+        ((x, y), (i, j)) constraints, see ArcConsistency
+    strategies : list, optional
+        Strategy objects. The default is None, which runs defaultStrategies().
+    workers : int, optional
+        number of processes. The default is WORKERS, one per core but no more than
+        there are strategies.
+    deadline : float, optional
+        seconds the strategies may search. The default is DEADLINE.
+    on_result : function, optional
+        called with every result as it arrives
+    value : function, optional
+        value(clue id, word) of placing a word, see MaxCspSearch. It is sent to every
+        worker, so it has to be picklable. The default is letterValue.
+
+    Returns
+    -------
+    result : dict
+        see runStrategy, or None if no strategy reported in time
+
+    """
+    strategies = strategies or defaultStrategies()
+    workers = min(workers or os.cpu_count() or 1, len(strategies))
+    domains = {var: set(domain) for var, domain in domains.items()}
+    results = queue.Queue()
+
+    # Strategies waiting for a free worker still stop at the common deadline
+    stop_at = time.time() + deadline
+    pool = multiprocessing.Pool(workers)
+    try:
+        for strategy in strategies:
+            pool.apply_async(runStrategy, (strategy, domains, arcs, stop_at, value), callback=results.put,
+                             error_callback=lambda e, name=strategy.name: results.put(
+                                 {'strategy': name, 'error': e}))
+        pool.close()
+
+        best = None
+        end = time.monotonic() + deadline + GRACE
+        for _ in strategies:
+            try:
+                result = results.get(timeout=max(end - time.monotonic(), 0))
+            except queue.Empty:
+                break
+            if 'error' in result:
+                print(f'\tStrategy {result["strategy"]} failed: {result["error"]!r}')
+                continue
+            if on_result:
+                on_result(result)
+            if result['complete'] or result['optimal']:
+                return result
+            if best is None or result['score'] > best['score']:
+                best = result
+        return best
+    finally:
+        pool.terminate()
+        pool.join()
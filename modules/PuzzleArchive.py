@@ -0,0 +1,291 @@
+"""
+SQLite-backed archive of past puzzles: their grids, clues and answers. Every clue is kept
+with its number and direction, so whole puzzles can be replayed (see Benchmark), and every
+distinct answer once. Unique indexes make saving a puzzle that is already archived, or a
+clue || answer pair that is already known, a no-op without reading the archive first.
+
+Clue || answer pairs without a puzzle, e.g. imported from the old crossword_data.txt,
+are kept as clues with no puzzle. Import such a file with:
+    python -m modules.PuzzleArchive --import crossword_data.txt
+"""
+
+import argparse
+import os
+import sqlite3
+import threading
+import time
+from modules import Settings
+from modules.CandidateStore import normalizeClue
+
+FILE_NAME = 'archive.sqlite'     # Name of the shared archive under Settings.DATA_DIR
+
+ACROSS = 'A'
+DOWN = 'D'
+
+# Condition leaving out the clues of the puzzle of the date bound to it, none if that is None
+_NOT_FROM = 'NOT EXISTS (SELECT 1 FROM puzzles WHERE puzzles.id = clues.puzzle_id AND puzzles.date = ?)'
+
+
+def parsePair(line):
+    """
+    Returns (clue, answer) from a 'clue || answer' line, or None if it is not one.
+
+    """
+    clue, separator, answer = line.rpartition(' || ')
+    if not separator or not clue.strip() or not answer.strip():
+        return None
+    return clue.strip(), answer.strip().upper()
+
+
+class PuzzleArchive:
+    """
+    Puzzles, grids, clues and answers kept in one SQLite database.
+
+    ...
+
+    Parameters
+    ----------
+    path : str
+        path of the SQLite database
+
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS puzzles (
+                id INTEGER PRIMARY KEY,
+                date TEXT NOT NULL UNIQUE,
+                size INTEGER NOT NULL,
+                saved REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS grids (
+                puzzle_id INTEGER PRIMARY KEY REFERENCES puzzles (id),
+                cells TEXT NOT NULL,        -- N*N characters in reading order, '#' for black cells
+                letters TEXT NOT NULL       -- letters of the open cells in reading order
+            );
+            CREATE TABLE IF NOT EXISTS answers (
+                id INTEGER PRIMARY KEY,
+                word TEXT NOT NULL UNIQUE
+            );
+            CREATE TABLE IF NOT EXISTS clues (
+                id INTEGER PRIMARY KEY,
+                puzzle_id INTEGER REFERENCES puzzles (id),
+                direction TEXT,
+                number INTEGER,
+                text TEXT NOT NULL,
+                normalized TEXT NOT NULL,
+                answer_id INTEGER NOT NULL REFERENCES answers (id)
+            );
+            CREATE UNIQUE INDEX IF NOT EXISTS clues_position ON clues (puzzle_id, direction, number)
+                WHERE puzzle_id IS NOT NULL;
+            CREATE UNIQUE INDEX IF NOT EXISTS clues_pair ON clues (normalized, answer_id)
+                WHERE puzzle_id IS NULL;
+            CREATE INDEX IF NOT EXISTS clues_normalized ON clues (normalized);
+        """)
+        self._db.commit()
+
+    def _answerId(self, word):
+        self._db.execute('INSERT OR IGNORE INTO answers (word) VALUES (?)', (word,))
+        return self._db.execute('SELECT id FROM answers WHERE word = ?', (word,)).fetchone()[0]
+
+    def savePuzzle(self, date, cells, letters, across, down):
+        """
+        Saves a solved puzzle, unless a puzzle of the same date is archived already.
+
+        ...
+
+        Parameters
+        ----------
+        date : str
+            date of the puzzle, e.g. '2021-04-01'
+        cells : list
+            2D array, True where a cell is filled black
+        letters : str
+            letters of the open cells in reading order
+        across : list
+            (clue no, clue text, answer) of the across clues
+        down : list
+            (clue no, clue text, answer) of the down clues
+
+        Returns
+        -------
+        saved : bool
+            whether the puzzle was new
+
+        """
+        n = len(cells)
+        grid = ''.join('#' if cells[r][c] else '.' for r in range(n) for c in range(n))
+
+        with self._lock:
+            cursor = self._db.execute('INSERT OR IGNORE INTO puzzles (date, size, saved) VALUES (?, ?, ?)',
+                                      (date, n, time.time()))
+            if not cursor.rowcount:
+                return False
+            puzzle_id = cursor.lastrowid
+            rows = []
+            for direction, clues in ((ACROSS, across), (DOWN, down)):
+                for number, text, answer in clues:
+                    rows.append((puzzle_id, direction, int(number), text, normalizeClue(text),
+                                 self._answerId(answer.upper())))
+            self._db.executemany(
+                'INSERT OR IGNORE INTO clues (puzzle_id, direction, number, text, normalized, answer_id) '
+                'VALUES (?, ?, ?, ?, ?, ?)', rows)
+            self._db.execute('INSERT OR REPLACE INTO grids VALUES (?, ?, ?)',
+                             (puzzle_id, grid, letters.upper()))
+            self._db.commit()
+        return True
+
+    def addPairs(self, pairs):
+        """
+        Adds clue || answer pairs that belong to no archived puzzle, skipping known pairs.
+
+        ...
+
+        Parameters
+        ----------
+        pairs : iterable
+            (clue text, answer) pairs
+
+        Returns
+        -------
+        added : int
+            number of pairs that were new
+
+        """
+        added = 0
+        with self._lock:
+            for text, answer in pairs:
+                added += self._db.execute(
+                    'INSERT OR IGNORE INTO clues (text, normalized, answer_id) VALUES (?, ?, ?)',
+                    (text, normalizeClue(text), self._answerId(answer.upper()))).rowcount
+            self._db.commit()
+        return added
+
+    def importText(self, path):
+        """
+        Imports a file of 'clue || answer' lines, the format savedata used to write.
+
+        ...
+
+        Returns
+        -------
+        added : int
+            number of pairs that were new
+
+        """
+        with open(path, encoding='utf-8', errors='ignore') as f:
+            return self.addPairs(pair for pair in map(parsePair, (line.strip() for line in f)) if pair)
+
+    def answers(self, exclude=None):
+        """
+        Returns every archived answer, leaving out the answers only the puzzle of date
+        exclude has.
+
+        """
+        with self._lock:
+            return {row[0] for row in self._db.execute(
+                'SELECT DISTINCT answers.word FROM clues JOIN answers ON answers.id = clues.answer_id '
+                f'WHERE {_NOT_FROM}', (exclude,))}
+
+    def answersFor(self, clue, exclude=None):
+        """
+        Returns the answers archived for a clue, compared after normalizeClue, leaving
+        out the clues of the puzzle of date exclude.
+
+        """
+        with self._lock:
+            return {row[0] for row in self._db.execute(
+                'SELECT DISTINCT answers.word FROM clues JOIN answers ON answers.id = clues.answer_id '
+                f'WHERE clues.normalized = ? AND {_NOT_FROM}', (normalizeClue(clue), exclude))}
+
+    def pairs(self):
+        """
+        Returns every archived (normalized clue, answer) pair with the number of clues
+        that have it.
+
+        """
+        with self._lock:
+            return self._db.execute(
+                'SELECT clues.normalized, answers.word, COUNT(*) FROM clues '
+                'JOIN answers ON answers.id = clues.answer_id GROUP BY clues.normalized, answers.word').fetchall()
+
+    def puzzlePairs(self, date):
+        """
+        Returns the (normalized clue, answer, times) rows of the puzzle of a date, see
+        pairs.
+
+        """
+        with self._lock:
+            return self._db.execute(
+                'SELECT clues.normalized, answers.word, COUNT(*) FROM clues '
+                'JOIN answers ON answers.id = clues.answer_id JOIN puzzles ON puzzles.id = clues.puzzle_id '
+                'WHERE puzzles.date = ? GROUP BY clues.normalized, answers.word', (date,)).fetchall()
+
+    def counts(self):
+        """
+        Returns the number of archived puzzles, clues and distinct answers.
+
+        """
+        with self._lock:
+            return tuple(self._db.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+                         for table in ('puzzles', 'clues', 'answers'))
+
+    def puzzles(self):
+        """
+        Generates the archived puzzles as the arguments of CrosswordDisplay.fromArchive,
+        oldest first.
+
+        ...
+
+        Yields
+        ------
+        puzzle : dict
+            date, cells (N*N flags in reading order), across and down ([clue no, clue text]
+            lists) and answers (a list holding the letters of the open cells)
+
+        """
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT puzzles.id, date, cells, letters FROM puzzles JOIN grids ON grids.puzzle_id = puzzles.id '
+                'ORDER BY date').fetchall()
+        for puzzle_id, date, cells, letters in rows:
+            with self._lock:
+                clues = self._db.execute(
+                    'SELECT direction, number, text FROM clues WHERE puzzle_id = ? ORDER BY direction, number',
+                    (puzzle_id,)).fetchall()
+            yield {
+                'date': date,
+                'cells': [cell == '#' for cell in cells],
+                'across': [[str(number), text] for direction, number, text in clues if direction == ACROSS],
+                'down': [[str(number), text] for direction, number, text in clues if direction == DOWN],
+                'answers': [letters],
+            }
+
+
+def defaultPath():
+    """
+    Returns the path of the shared archive under Settings.DATA_DIR.
+
+    """
+    return Settings.dataPath(FILE_NAME)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Manage the puzzle archive.')
+    parser.add_argument('--archive', default=None, help='archive database, the shared one by default')
+    parser.add_argument('--import', dest='text', metavar='FILE', help="import a file of 'clue || answer' lines")
+    args = parser.parse_args()
+
+    archive = PuzzleArchive(args.archive or defaultPath())
+    if args.text:
+        print(f'Imported {archive.importText(args.text)} new clue || answer pairs')
+    puzzles, clues, answers = archive.counts()
+    print(f'{archive.path}: {puzzles} puzzles, {clues} clues, {answers} distinct answers')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""
+Compact, integer indexed view of a puzzle for the solver. Every clue is a slot numbered
+0..n-1 in the order the clues were given, and every crossing is a
+(slot, position, other slot, other position) row. Crossings are found by putting each
+letter of each clue in a cell map once, instead of comparing every pair of clues. The
+searches take the crossings as arcs between slots and index them themselves.
+"""
+
+ACROSS = (0, 1)
+DOWN = (1, 0)
+
+
+def findSlots(cells, min_length=2):
+    """
+    Finds the answers of a grid of any size: every run of at least min_length open cells
+    along a row or a column.
+
+    ...
+
+    Parameters
+    ----------
+    cells : list
+        2D array, True where a cell is filled black
+    min_length : int, optional
+        shortest run that is an answer. The default is 2.
+
+    Returns
+    -------
+    across : list
+        (start position, length) of the across answers in reading order, which is
+        also the order of their clue numbers
+    down : list
+        (start position, length) of the down answers in reading order
+
+    """
+    rows, columns = len(cells), len(cells[0])
+    across, down = [], []
+    for r in range(rows):
+        for c in range(columns):
+            if cells[r][c]:
+                continue
+            if c == 0 or cells[r][c - 1]:
+                length = 0
+                while c + length < columns and not cells[r][c + length]:
+                    length += 1
+                if length >= min_length:
+                    across.append(((r, c), length))
+            if r == 0 or cells[r - 1][c]:
+                length = 0
+                while r + length < rows and not cells[r + length][c]:
+                    length += 1
+                if length >= min_length:
+                    down.append(((r, c), length))
+    return across, down
+
+
+class PuzzleModel:
+    """
+    Slots and crossings of a set of clues.
+
+    ...
+
+    Parameters
+    ----------
+    clues : iterable
+        Clue objects, or anything else with id, length and letter_positions attributes,
+        numbered in this order. Each clue's slot attribute is set.
+
+    Attributes
+    ----------
+    ids : list
+        slot -> clue id
+    slots : dict
+        clue id -> slot
+    crossings : list
+        sorted (slot, position, other slot, other position) rows, every crossing appears
+        once from each side
+
+    """
+
+    def __init__(self, clues):
+        clues = list(clues)
+        self.ids = [clue.id for clue in clues]
+        self.slots = {id: slot for slot, id in enumerate(self.ids)}
+
+        cells = {}      # (row, column) -> (slot, position) pairs using that cell
+        for slot, clue in enumerate(clues):
+            clue.slot = slot
+            for position, cell in enumerate(clue.letter_positions):
+                cells.setdefault(cell, []).append((slot, position))
+
+        rows = []
+        for users in cells.values():
+            for slot, position in users:
+                for other, other_position in users:
+                    if other != slot:
+                        rows.append((slot, position, other, other_position))
+        rows.sort()
+        self.crossings = rows
+
+    def __len__(self):
+        return len(self.ids)
+
+    def arcs(self):
+        """
+        Returns the crossings as ((slot, other slot), (position, other position)) arcs,
+        the form ArcConsistency and the searches take.
+
+        """
+        return [((slot, other), (position, other_position))
+                for slot, position, other, other_position in self.crossings]
+
+    def constraints(self):
+        """
+        Returns the crossings as arcs between clue ids, see CROSSWALKER.constraints.
+
+        """
+        return [((self.ids[slot], self.ids[other]), positions)
+                for (slot, other), positions in self.arcs()]
+
+    def domains(self, clues):
+        """
+        Returns slot -> candidates of a clue id -> Clue dict.
+
+        """
+        return {self.slots[id]: clue.candidates for id, clue in clues.items()}
+
+    def scores(self, clues):
+        """
+        Returns slot -> candidate scores of a clue id -> Clue dict.
+
+        """
+        return {self.slots[id]: clue.scores for id, clue in clues.items()}
+
+    def toIds(self, items):
+        """
+        Maps (slot, answer) pairs back to (clue id, answer) pairs.
+
+        """
+        return [(self.ids[slot], answer) for slot, answer in items]
@@ -0,0 +1,29 @@
+"""
+Locations of the files CROSSWALKER keeps between runs (caches, indexes, archives).
+Everything lives under DATA_DIR, which can be moved by setting CROSSWALKER_HOME.
+"""
+
+import os
+
+DATA_DIR = os.environ.get('CROSSWALKER_HOME', os.path.join(os.path.expanduser('~'), '.crosswalker'))
+
+
+def dataPath(*parts):
+    """
+    Returns the path of a file under DATA_DIR, creating its parent directory if needed.
+
+    ...
+
+    Parameters
+    ----------
+    *parts : str
+        path components relative to DATA_DIR
+
+    Returns
+    -------
+    path : str
+
+    """
+    path = os.path.join(DATA_DIR, *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
@@ -0,0 +1,131 @@
+"""
+Bounded collector for the solutions found by the search. Only the k best solutions
+are kept in a min-heap keyed on their score, so memory stays flat however many leaves
+the search visits, and the same assignment reached twice is only kept once.
+"""
+
+import heapq
+import itertools
+
+
+def placedScore(items):
+    """
+    Default score of a solution: the number of answers placed, then the number of letters.
+
+    """
+    return (len(items), sum(len(answer) for _, answer in items))
+
+
+class ValueScore:
+    """
+    Score of a solution: the number of answers placed, then the total value of the
+    answers, the way MaxCspSearch compares solutions.
+
+    ...
+
+    Parameters
+    ----------
+    value : function
+        value(clue id, word) of placing a word, see MaxCspSearch
+
+    """
+
+    def __init__(self, value):
+        self.value = value
+
+    def __call__(self, items):
+        return (len(items), sum(self.value(var, answer) for var, answer in items))
+
+
+class SolutionSink:
+    """
+    Keeps the k best distinct solutions offered to it.
+
+    ...
+
+    Parameters
+    ----------
+    k : int, optional
+        number of solutions kept. The default is 10.
+    score : function, optional
+        maps a list of (clue id, answer) pairs to a comparable score, higher is better.
+        The default is placedScore.
+
+    """
+
+    def __init__(self, k=10, score=placedScore):
+        self.k = k
+        self.score = score
+        self._heap = []                 # (score, -arrival, key, items), worst solution on top
+        self._keys = set()              # keys of the solutions in the heap
+        self._arrival = itertools.count()
+        self._best = None               # (score, items)
+        self.offered = 0
+
+    def __len__(self):
+        return len(self._heap)
+
+    def offer(self, items):
+        """
+        Offers a solution. Among equally scored solutions the earliest ones are kept.
+
+        ...
+
+        Parameters
+        ----------
+        items : list
+            (clue id, answer) pairs
+
+        Returns
+        -------
+        improved : bool
+            whether the solution is better than every solution seen before
+
+        """
+        self.offered += 1
+        key = frozenset(items)
+        if key in self._keys:
+            return False
+
+        score = self.score(items)
+        entry = (score, -next(self._arrival), key, list(items))
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, entry)
+        elif entry[:2] > self._heap[0][:2]:
+            evicted = heapq.heapreplace(self._heap, entry)
+            self._keys.discard(evicted[2])
+        else:
+            return False
+        self._keys.add(key)
+
+        if self._best is None or score > self._best[0]:
+            self._best = (score, entry[3])
+            return True
+        return False
+
+    def best(self):
+        """
+        Returns the best solution so far, or None if nothing was offered.
+
+        """
+        return self._best[1] if self._best else None
+
+    def bestScore(self):
+        return self._best[0] if self._best else None
+
+    def top(self):
+        """
+        Returns the kept solutions, best first.
+
+        """
+        return [entry[3] for entry in sorted(self._heap, reverse=True)]
+
+    def stream(self, solutions):
+        """
+        Offers every solution of an iterable and yields the ones that improve on all
+        earlier ones, so a caller can act on better answers while the search goes on.
+
+        """
+        for items in solutions:
+            if self.offer(items):
+                yield items
@@ -2,16 +2,20 @@
 Finds candidates for a clue via Wikipedia.
 """
 
-import wikipedia as wiki
-import urllib.request
+import json
 import re
-from bs4 import BeautifulSoup
+from collections import Counter
+from modules import HttpCache
+from modules.LazyLoader import lazyImport
+
+wiki = lazyImport('wikipedia')
+BeautifulSoup = lazyImport('bs4', 'BeautifulSoup')
 
 
 def getCandidates(clue, num_results=20, summaries=5):   
     """
     Takes a clue and searches on Wikipedia. Find summary pages and titles then
-    returns set of candidates.
+    returns the candidates with the number of times each one turned up.
 
     Parameters
     ----------
@@ -23,19 +27,18 @@ def getCandidates(clue, num_results=20, summaries=5):
 
     Returns
     -------
-    candidates : set
-        set of candidates obtained via Wikipedia.
+    candidates : Counter
+        candidates obtained via Wikipedia -> number of mentions.
 
     """    
                                                                           # Initialize summarized page count and listed result on per search
     formatted_clue = clue.replace(' ', '+')                               # Clues are formatted to certain type
-    candidates = set()
+    candidates = Counter()
     print('\tGetting Wikipedia Candidates')
     URL = f'https://en.wikipedia.org/w/index.php?search={formatted_clue}' # Set URL for each clue
     try:
         # Setting website link for web scraping 
-        webUrl = urllib.request.urlopen(URL)
-        data = webUrl.read()
+        data = HttpCache.fetch(URL, 'wikipedia')
         soup = BeautifulSoup(data, 'html.parser')
         definitions = soup.find_all('div', {'class': 'searchresult'})
         definitions.extend(soup.find_all('span', {'class': 'searchalttitle'}))
@@ -44,14 +47,18 @@ def getCandidates(clue, num_results=20, summaries=5):
             words = re.split('[;:,.\-\% ]', text)                         # Filtering unnecessary characters
             words.append(text.replace(" ", ""))
             candidates.update(words)                                      # Add resulted words to set of candidates
-    except:
+    except HttpCache.CacheMiss:
+        raise
+    except OSError:
         pass
 
-    pages = wiki.search(clue, num_results)
+    pages = json.loads(HttpCache.cached(
+        f'wikipedia:search/{num_results}/{clue}', 'wikipedia',
+        lambda: json.dumps(wiki.search(clue, num_results)).encode('utf-8')))
     i = 0
     for page in pages:
-        candidates.add(page.replace(' ', ''))
-        candidates.add(page.replace('-', ''))
+        candidates[page.replace(' ', '')] += 1
+        candidates[page.replace('-', '')] += 1
         candidates.update([word for word in page.split(' ')])
         if i < summaries:
             i += 1
@@ -66,8 +73,12 @@ def getWikiSummary(page, sentences=3):
     """
     words = []
     try:
-        summary = wiki.summary(page, sentences=sentences)
+        summary = HttpCache.cached(
+            f'wikipedia:summary/{sentences}/{page}', 'wikipedia',
+            lambda: wiki.summary(page, sentences=sentences).encode('utf-8')).decode('utf-8')
         words = summary.split(' ')
-    except:
+    except HttpCache.CacheMiss:
+        raise
+    except (OSError, wiki.exceptions.WikipediaException):
         pass
     return words
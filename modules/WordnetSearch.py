@@ -1,14 +1,28 @@
 """
 Finds candidates for a clue via WordNet.
+
+The synsets of the clue are expanded breadth first through their root hypernyms, member
+holonyms, hyponyms and hypernyms. Every synset is visited once, at most MAX_NODES of them
+per clue, and the relations and lemmas of a synset are looked up once per process.
 """
 
 import re
-from nltk.corpus import wordnet
+import functools
+from collections import Counter, deque
+from modules.LazyLoader import lazyImport
+
+wordnet = lazyImport('nltk.corpus', 'wordnet')
+
+RELATIONS = ('root_hypernyms', 'member_holonyms', 'hyponyms', 'hypernyms')
+MAX_DEPTH = 3           # Synsets this many relations away from the clue's are still expanded
+MAX_NODES = 2000        # Most synsets visited for one clue
+CACHE_SIZE = 65536      # Synsets whose relations and lemmas are remembered
 
 
 def getCandidates(clue, length):
     """
-    Takes a clue and returns a set of candidates for that clue using WordNet.
+    Takes a clue and returns the candidates for that clue using WordNet, with the
+    number of synsets each one turned up in.
     
     ...
 
@@ -20,62 +34,88 @@ def getCandidates(clue, length):
 
     Returns
     -------
-    candidates : set
-        set of candidates obtained via WordNet.
+    candidates : Counter
+        candidates obtained via WordNet -> number of synsets
         
     """
 
     # Skips the fill in the blank clues
     if '___' in clue:
-        return {}
+        return Counter()
     print('\tGetting Wordnet Candidates')
-    candidates = set()
     formatted_clue = clue.replace(' ', '_')                               # Filtering the spaces and underscore
     synsets = wordnet.synsets(formatted_clue)                             # Find synonyms
-    candidates.update(
-        {y for x in synsets for y in x.lemma_names() if len(y) == length})
-    for syn in synsets:
-        candidates.update(searchWordnet(syn, length, candidates))
+    return searchWordnet(synsets, length)
 
-    return candidates
+
+def preload():
+    """
+    Loads the WordNet corpus now. The lazy corpus reader is not safe to load from
+    several threads at once, so call this before searching concurrently.
+
+    """
+    wordnet.ensure_loaded()
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def related(synset):
+    """
+    Returns the synsets related to synset through any of RELATIONS.
+
+    """
+    return tuple(nym for attr in RELATIONS for nym in getattr(synset, attr)())
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def lemmaNames(synset):
+    """
+    Returns the lemma names of synset without underscores.
+
+    """
+    return tuple(noSpace(name) for name in synset.lemma_names())
 
 
-def searchWordnet(synset, length, candidates, max_iterations=3, iteration=0):
+def searchWordnet(synsets, length, max_depth=MAX_DEPTH, max_nodes=MAX_NODES):
     """
-    Searches for candidates of the given length in WordNet
+    Searches for candidates of the given length in WordNet, breadth first from synsets.
+    Every synset reached gives its lemmas of the given length, the ones at most
+    max_depth relations away also give the words of their definition and lead on to
+    their related synsets.
+
+    ...
 
     Parameters
     ----------
-    synset 
+    synsets : list
+        synsets of the clue
     length : int
         length of the required answer.
-    candidates : set
-        set of candidates for the clue.
-    max_iterations : int, optional
-        maximum number of iterations. The default is 3.
-    iteration : int, optional
-        current number of iterations. The default is 0.
+    max_depth : int, optional
+        relations away from synsets a synset may be to be expanded. The default is
+        MAX_DEPTH.
+    max_nodes : int, optional
+        most synsets visited. The default is MAX_NODES.
 
     Returns
     -------
-    candidates : set
-        set of candidates for the clue.
+    candidates : Counter
+        candidates for the clue -> number of synsets they turned up in
 
     """
-    if synset.lemma_names():
-        candidates.update({
-            noSpace(lemmaname) for lemmaname in synset.lemma_names() if noSpace(lemmaname) == length
-        })
-    candidates.update([word for word in (synset.definition()).split(' ')])
-    for attr in ['root_hypernyms', 'member_holonyms', 'hyponyms', 'hypernyms']:
-        if getattr(synset, attr)():
-            for nym in getattr(synset, attr)():
-                candidates.update({
-                    noSpace(lemma.name()) for lemma in nym.lemmas() if len(noSpace(lemma.name())) == length
-                })
-                if iteration < max_iterations:
-                    candidates.update(searchWordnet(
-                        nym, length, candidates, max_iterations, iteration+1))
+    candidates = Counter()
+    synsets = list(dict.fromkeys(synsets))
+    visited = set(synsets)
+    queue = deque((synset, 0) for synset in synsets)
+    while queue:
+        synset, depth = queue.popleft()
+        candidates.update(name for name in lemmaNames(synset) if len(name) == length)
+        if depth > max_depth:
+            continue
+        candidates.update(synset.definition().split(' '))
+        for nym in related(synset):
+            if nym not in visited and len(visited) < max_nodes:
+                visited.add(nym)
+                queue.append((nym, depth + 1))
     return candidates
 
 
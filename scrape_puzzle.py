@@ -1,21 +1,28 @@
 """
 Scrapes today's NYT mini-crossword from the website and creates an image file
 that has the clues and the answers, prints a timestamp with the GROUP_NAME
-in the bottom right corner of the grid. Can also write the clue || answer pairs
-to a text file for future reference.
+in the bottom right corner of the grid. Can also save the puzzle with its clues and
+answers to the puzzle archive for future reference.
 """
 
-import requests
 import math
+import os
 import textwrap
 import datetime
-import time
-from selenium import webdriver
-from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.chrome.options import Options
-import numpy as np
-from bs4 import BeautifulSoup
-from PIL import Image, ImageDraw, ImageFont
+from modules import DriverPool
+from modules import HttpCache
+from modules import Metrics
+from modules import PuzzleArchive
+from modules import Settings
+from modules.PuzzleModel import findSlots
+from modules.LazyLoader import lazyImport
+
+# Heavy dependencies are only imported the first time they are used
+np = lazyImport('numpy')
+BeautifulSoup = lazyImport('bs4', 'BeautifulSoup')
+Image = lazyImport('PIL.Image')
+ImageDraw = lazyImport('PIL.ImageDraw')
+ImageFont = lazyImport('PIL.ImageFont')
 
 # Timestamp options
 GROUP_NAME = 'CROSSWALKER'
@@ -27,9 +34,11 @@ IMG_FILE_NAME = "{}-crossword.png".format(
     TIME.strftime("%d_%m_%Y"))
 IMG_SAVE_PATH = f"E:\Bilkent\CS 461\Project\Demo 2 Last Last\\{IMG_FILE_NAME}"
 
-# Change IMG_SAVE_PATH to where you want to save the crossword data
-DATA_FILE_NAME = "crossword_data.txt"
-DATA_SAVE_PATH = f"E:\Bilkent\CS 461\Project\Demo 2 Last Last\\{DATA_FILE_NAME}"
+# Solved puzzles are saved to the puzzle archive, set CROSSWALKER_ARCHIVE to use another one
+ARCHIVE_PATH = os.environ.get('CROSSWALKER_ARCHIVE') or os.path.join(Settings.DATA_DIR, PuzzleArchive.FILE_NAME)
+
+# Date today's puzzle is archived under
+ARCHIVE_DATE = TIME.strftime("%Y-%m-%d")
 
 # This can be changed to wayback machine links to scrape older crosswords
 URL = "https://www.nytimes.com/crosswords/game/mini"
@@ -232,39 +241,33 @@ class CrosswordDisplay():
                 https://chromedriver.chromium.org/downloads
         """
 
-        # Create a headless chromedriver instance, so that we can scrape in the
-        # background without an annoying browser popping up
-        options = Options()
-        options.add_argument('--log-level=3')
-        options.add_experimental_option('excludeSwitches', ['enable-logging'])
-        driver = webdriver.Chrome(options=options)
-        #driver = webdriver.Chrome()
-        driver.get(URL)
-
-        # time.sleep(2) #Uncomment this line if selenium is giving problems like can't click.
-        # This seems to be cause by ads loading maybe?
-
-        # The answer_letters are not in the HTML of the website by default. However
-        # once we choose to reveal the answer_letters they are added to the HTML.
-        # To do this requires 4 button clicks. In order, we must click:
-        #   1. The Play without an account button, identified
-        #       by the class name StartModal-underlined--3IDBr
-        #   2. The Reveal button which can be selected by its aria-label attribute
-        #   3. The Puzzle button, which can be identified by its link text
-        #   4. The Reveal button again, this time on the Are you sure? pop-up,
-        #       which can be identified by its xpath
-        driver.find_element_by_class_name(
-            "StartModal-underlined--3IDBr").click()
-        driver.find_element_by_css_selector(
-            "button[aria-label='reveal']").click()
-        driver.find_element_by_link_text("Puzzle").click()
-        driver.find_element_by_xpath("//span[.='Reveal']").click()
-
-        # Transfer the HTML data of the page over to BeautifulSoup
-        # to get the answer letters and close the selenium webdriver
-        soup = BeautifulSoup(driver.page_source, 'html.parser')
-        time.sleep(3)
-        driver.close()
+        # Borrow a headless chromedriver instance from the shared pool, so that we can
+        # scrape in the background without an annoying browser popping up
+        with DriverPool.borrow() as driver:
+            driver.get(URL)
+
+            # time.sleep(2) #Uncomment this line if selenium is giving problems like can't click.
+            # This seems to be cause by ads loading maybe?
+
+            # The answer_letters are not in the HTML of the website by default. However
+            # once we choose to reveal the answer_letters they are added to the HTML.
+            # To do this requires 4 button clicks. In order, we must click:
+            #   1. The Play without an account button, identified
+            #       by the class name StartModal-underlined--3IDBr
+            #   2. The Reveal button which can be selected by its aria-label attribute
+            #   3. The Puzzle button, which can be identified by its link text
+            #   4. The Reveal button again, this time on the Are you sure? pop-up,
+            #       which can be identified by its xpath
+            driver.find_element_by_class_name(
+                "StartModal-underlined--3IDBr").click()
+            driver.find_element_by_css_selector(
+                "button[aria-label='reveal']").click()
+            driver.find_element_by_link_text("Puzzle").click()
+            driver.find_element_by_xpath("//span[.='Reveal']").click()
+
+            # Transfer the HTML data of the page over to BeautifulSoup
+            # to get the answer letters and give the driver back to the pool
+            soup = BeautifulSoup(driver.page_source, 'html.parser')
 
         # Choose all the answer letter objects from HTML, which are identified
         # by the class name Cell-hidden--3xQI1
@@ -335,6 +338,7 @@ class CrosswordDisplay():
             self.img.save(IMG_SAVE_PATH)
         self.img.show()
 
+    @Metrics.timed('scrape')
     def scrapecrossword(self, data=True, solve=True) -> list:
         """
             Scrapes the website, gets answer_letters, saves image and saves data by default. Flags
@@ -346,7 +350,8 @@ class CrosswordDisplay():
             ----------
                 data=True: bool
                     optional parameter, True by default
-                    if True the clues and answer_letters will be saved to DATA_SAVE_PATH
+                    if True the puzzle, its clues and answer_letters will be saved to the
+                    puzzle archive at ARCHIVE_PATH
                     solve must be True as well for data to be saved
                 solve=True: bool
                     optional parameter, True by default
@@ -355,8 +360,8 @@ class CrosswordDisplay():
         """
         self.date = None
         # Use BeautifulSoup to get the HTML data we need
-        page = requests.get(URL)
-        soup = BeautifulSoup(page.content, 'html.parser')
+        page = HttpCache.fetch(URL, 'nyt')
+        soup = BeautifulSoup(page, 'html.parser')
 
         # Get an array of cell objects that has an attribute that tells us whether a cell is painted black
         grid = soup.find_all('rect', {'role': 'cell'})
@@ -438,15 +443,52 @@ class CrosswordDisplay():
                           answer_letters, cell_isfilled, cell_no, N)
         return self.cells, self.across, self.down
 
-    def fromArchive(self, cells, across_clues, down_clues, answers, date):
+    def fromArchive(self, cells, across_clues, down_clues, answers, date, draw=True) -> list:
+        """
+            Loads an archived puzzle instead of scraping today's, and draws it with its
+            answers unless draw is False.
+
+            ...
+
+            Parameters
+            ----------
+                cells: list
+                    N*N flags in reading order, True where a cell is filled black
+                across_clues: list
+                    [clue no, clue text] of the across clues
+                down_clues: list
+                    [clue no, clue text] of the down clues
+                answers: list
+                    strings that joined together give the letters of the open cells
+                    in reading order, e.g. the rows without their black cells
+                date: str
+                    date of the puzzle, names the saved image
+                draw=True: bool
+                    optional parameter, True by default
+                    if False nothing is drawn, e.g. to solve archived puzzles in bulk
+
+            ...
+
+            Returns
+            -------
+                cells, across and down like scrapecrossword
+        """
         self.date = date
         answer_letters = list(''.join(answers))
         list_ = cells
-        N = 5
+        N = int(math.sqrt(len(list_)))
         self.N = N
         # Using numpy to convert the 1D list_ into 2D cell_isfilled
         cell_isfilled = np.array(list_).reshape(N, N)
         self.cells = cell_isfilled
+
+        # Answer lengths come from the grid, the clues are in reading order like the answers
+        across_slots, down_slots = findSlots(cell_isfilled)
+        self.across = [(clue[1], length) for clue, (start, length) in zip(across_clues, across_slots)]
+        self.down = [(clue[1], length) for clue, (start, length) in zip(down_clues, down_slots)]
+        if not draw:
+            return self.cells, self.across, self.down
+
         # Create the image we are going to draw on, and the draw object
         self.img = Image.new('RGB', (N * CELL_LEN + 3 * X_OFF + 450 + 2 * X_OFF + N * CELL_LEN + X_OFF,
                                      N * CELL_LEN + 2 * Y_OFF), color='white')
@@ -484,10 +526,12 @@ class CrosswordDisplay():
         self.drawgrid(cell_isfilled, cell_no, d, N)
         self.drawanswer_letters(cell_isfilled, answer_letters, d, N)
         self.writeclues(across_clues, down_clues, d, N)
+        return self.cells, self.across, self.down
 
     def savedata(self, clues, answer_letters, cell_isfilled, cell_no, N):
         """
-            Saves the clues and their corresponding answers to the text file at DATA_SAVE_PATH
+            Saves the puzzle with its grid, clues and answers to the puzzle archive at
+            ARCHIVE_PATH. A puzzle already archived for today is not saved again.
 
             ...
 
@@ -505,15 +549,12 @@ class CrosswordDisplay():
                     side length of the crossword grid
         """
 
-        # We need a numpy array for the operations we have to do next
         # 2D array to hold all letters in the grid, '' if filled black
         answers = np.array([["" for _ in range(N)] for __ in range(N)])
 
         # Extract across and down clues
         across_clues, down_clues = clues[0], clues[1]
 
-        across_answers = []
-        down_answers = []
         ind = 0
 
         # Create the 2D answers array
@@ -525,62 +566,25 @@ class CrosswordDisplay():
                     answers[r][c] = answer_letters[ind]
                     ind += 1
 
-        # Get across answers
-        for ans in answers:
-            across_answers.append(''.join(ans))
-
-        # Getting the across answers is easy but the down answers are pretty hard because
-        # they are not always in the order they appear. To match them with clues we have to
-        # get clue no's in the order they appear from left to right first.
-        down_answer_nos = [-1 for _ in range(N)]
-        for r in range(N):
-            for c in range(N):
-                if not cell_isfilled[r][c]:
-                    if r == 0:
-                        down_answer_nos[c] = (int(cell_no[r][c]))
-                    else:
-                        top_neighbor = cell_isfilled[r - 1][c]
-                        if top_neighbor:
-                            down_answer_nos[c] = int(cell_no[r][c])
-
-        # Rotate and flip the array so that down answers are the rows now.
-        answers = np.rot90(answers)
-        answers = np.flipud(answers)
-
-        # Add down_answers in wrong order
-        for ans in answers:
-            down_answers.append(''.join(ans))
-
-        # Sort the down_answers based on the down_answer_nos to match them correctly with
-        # the down clues
-        down_answers = [ans for ind, ans in sorted(
-            zip(down_answer_nos, down_answers), key=lambda pair: pair[0])]
-
-        # Get existing clue || answer pairs to not add duplicate pairs
-        existing = set()
-        f = open(DATA_SAVE_PATH, 'r')
-        lines = f.readlines()
-        for line in lines:
-            existing.add(line.strip())
-        f.close()
+        # Read every answer off the grid. Answers are found in reading order, which is
+        # the order of their clue numbers and so the order of the clues
+        across_slots, down_slots = findSlots(cell_isfilled)
+        across_answers = [''.join(answers[r][c + i] for i in range(length))
+                          for (r, c), length in across_slots]
+        down_answers = [''.join(answers[r + i][c] for i in range(length))
+                        for (r, c), length in down_slots]
 
         self.across = [(across_clues[i][1], len(across_answers[i]))
                        for i in range(len(across_clues))]
         self.down = [(down_clues[i][1], len(down_answers[i]))
                      for i in range(len(down_clues))]
-        f = open(DATA_SAVE_PATH, 'a')
-
-        # Write all clue || answer pairs to file
-        for clue, ans in zip(across_clues, across_answers):
-            pair = f"{clue[1]} || {ans}"
-            if pair not in existing:
-                f.write(f"{clue[1]} || {ans}\n")
-        for clue, ans in zip(down_clues, down_answers):
-            pair = f"{clue[1]} || {ans}"
-            if pair not in existing:
-                f.write(f"{clue[1]} || {ans}\n")
-        f.close()
 
+        # Duplicates are skipped by the archive's unique indexes, no need to read it first
+        archive = PuzzleArchive.PuzzleArchive(ARCHIVE_PATH)
+        archive.savePuzzle(
+            ARCHIVE_DATE, cell_isfilled, ''.join(answer_letters),
+            [(clue[0], clue[1], ans) for clue, ans in zip(across_clues, across_answers)],
+            [(clue[0], clue[1], ans) for clue, ans in zip(down_clues, down_answers)])
 
 def main():
     S = CrosswordDisplay()